@@ -1,5 +1,6 @@
 import logging
 import json
+import asyncio
 import time
 from typing import List, Dict, Optional, Union
 from datetime import datetime, timedelta
@@ -34,6 +35,36 @@ class SemanticMemoryManager:
             logger.error(f"Error computing cosine similarity: {e}")
             return 0.0
     
+    def rank_embeddings(self, rows: List[Dict], query: List[float], k: int) -> List[Dict]:
+        vectors = []
+        kept = []
+        for row in rows:
+            if row.get('embedding'):
+                vector = np.frombuffer(row['embedding'], dtype='<f4')
+            elif row.get('message_embedding'):
+                vector = np.asarray(json.loads(row['message_embedding']), dtype=np.float32)
+            else:
+                continue
+            if len(vector) != len(query):
+                continue
+            vectors.append(vector)
+            kept.append(row)
+        if not vectors:
+            return []
+        
+        matrix = np.vstack(vectors)
+        query_vector = np.asarray(query, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        similarities = np.divide(matrix @ query_vector, norms, out=np.zeros(len(kept), dtype=np.float32), where=norms > 0)
+        return [
+            {
+                'user_message': kept[i]['user_message'],
+                'agent_response': kept[i]['agent_response'],
+                'similarity': float(similarities[i])
+            }
+            for i in np.argsort(-similarities)[:k]
+        ]
+    
     def compute_recency_score(self, message_time: datetime, current_time: datetime, time_window_hours: int) -> float:
         try:
             time_diff = (current_time - message_time).total_seconds()
@@ -92,27 +123,6 @@ class SemanticMemoryManager:
             embeddings_computed = 0
             embeddings_cached = 0
             
-            db_embeddings_cache = {}
-            if self.db and self.db.pool:
-                try:
-                    async with self.db.pool.acquire() as conn:
-                        rows = await conn.fetch("""
-                            SELECT user_message, message_embedding, agent_response
-                            FROM chat_history
-                            WHERE channel_id = $1
-                              AND created_at >= $2
-                              AND message_embedding IS NOT NULL
-                        """, channel_id, cutoff_time)
-                        for row in rows:
-                            user_msg = row['user_message']
-                            if user_msg:
-                                db_embeddings_cache[user_msg] = {
-                                    'embedding': json.loads(row['message_embedding']) if row['message_embedding'] else None,
-                                    'agent_response': row['agent_response']
-                                }
-                except Exception as e:
-                    logger.debug(f"Memory: Could not fetch DB embeddings: {e}")
-            
             bot_id = channel.guild.me.id if channel.guild and channel.guild.me else None
             message_pairs = []
             
@@ -145,6 +155,15 @@ class SemanticMemoryManager:
             
             logger.debug(f"Memory: Grouped {len(discord_messages)} messages into {len(message_pairs)} user message pairs")
             
+            db_matches = {}
+            if self.db and self.db.pool and message_pairs:
+                texts = list({pair['user_message'] for pair in message_pairs})
+                similar = await self.db.get_similar_messages(channel_id, cutoff_time, current_embedding, texts)
+                if similar is None:
+                    rows = await self.db.get_channel_embeddings(channel_id, cutoff_time, texts)
+                    similar = await asyncio.to_thread(self.rank_embeddings, rows, current_embedding, len(rows))
+                db_matches = {row['user_message']: row for row in similar if row['user_message']}
+            
             for msg_data in message_pairs:
                 message_id = msg_data['id']
                 user_id = msg_data['user_id']
@@ -153,17 +172,15 @@ class SemanticMemoryManager:
                 agent_response = msg_data.get('agent_response')
                 created_at = msg_data['created_at']
                 
-                db_entry = db_embeddings_cache.get(user_message)
-                stored_embedding = None
+                db_entry = db_matches.get(user_message)
                 
-                if db_entry and db_entry.get('embedding'):
-                    stored_embedding = db_entry.get('embedding')
+                if db_entry:
+                    similarity = db_entry['similarity']
                     if not agent_response and db_entry.get('agent_response'):
                         agent_response = db_entry.get('agent_response')
                     embeddings_cached += 1
-                    logger.debug(f"Memory: Using cached embedding for message {message_id}")
-                
-                if stored_embedding is None:
+                    logger.debug(f"Memory: Using stored similarity for message {message_id}")
+                else:
                     try:
                         full_text = user_message
                         if agent_response:
@@ -175,8 +192,7 @@ class SemanticMemoryManager:
                     except Exception as e:
                         logger.error(f"Memory: Error computing embedding for message {message_id}: {e}")
                         continue
-                
-                similarity = self.cosine_similarity(current_embedding, stored_embedding)
+                    similarity = self.cosine_similarity(current_embedding, stored_embedding)
                 
                 if isinstance(created_at, datetime):
                     msg_created_at = created_at.replace(tzinfo=None) if created_at.tzinfo else created_at
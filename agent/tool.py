@@ -168,7 +168,7 @@ async def _skip_async(interaction_or_message, skip_i: Optional[int] = None, skip
     if not guild:
         return "Error: No guild found"
     
-    await skip_logic(interaction, state, guild.id, skip_i=skip_i, skip_to_j=skip_to_j)
+    await state.actors.run(guild.id, lambda: skip_logic(interaction, state, guild.id, skip_i=skip_i, skip_to_j=skip_to_j))
     
     if skip_to_j is not None:
         return f"Skipped to song {skip_to_j} in queue"
@@ -189,7 +189,7 @@ async def _pause_async(interaction_or_message) -> str:
     if not guild:
         return "Error: No guild found"
     
-    await pause_logic(interaction, state, guild.id)
+    await state.actors.run(guild.id, lambda: pause_logic(interaction, state, guild.id))
     return "Paused playback"
 
 async def _resume_async(interaction_or_message) -> str:
@@ -204,7 +204,7 @@ async def _resume_async(interaction_or_message) -> str:
     if not guild:
         return "Error: No guild found"
     
-    await resume_logic(interaction, state, guild.id)
+    await state.actors.run(guild.id, lambda: resume_logic(interaction, state, guild.id))
     return "Resumed playback"
 
 async def _random_async(interaction_or_message, n: int) -> str:
@@ -0,0 +1,111 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .utils import construct_log
+
+logger = logging.getLogger(__name__)
+
+ACTOR_IDLE_SECONDS = 60.0
+SLOW_WAIT_SECONDS = 1.0
+
+_current_guild: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('current_actor_guild', default=None)
+
+class GuildActor:
+    def __init__(self, guild_id: int, registry: 'GuildActorRegistry'):
+        self.guild_id = guild_id
+        self.registry = registry
+        self.mailbox: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+        self.task.add_done_callback(self._stopped)
+
+    def _stopped(self, task: asyncio.Task):
+        # Whatever ended the loop, later run() calls must get a fresh actor, not a mailbox nobody drains.
+        self.registry._retire(self)
+        while not self.mailbox.empty():
+            _, _, future = self.mailbox.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"Actor for guild {self.guild_id} stopped"))
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(construct_log(f"Actor for guild {self.guild_id} crashed: {task.exception()!r}"))
+
+    async def _run(self):
+        while True:
+            try:
+                enqueued_at, factory, future = await asyncio.wait_for(self.mailbox.get(), timeout=ACTOR_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                if self.mailbox.empty():
+                    self.registry._retire(self)
+                    return
+                continue
+
+            if future.cancelled():
+                continue
+
+            wait = time.perf_counter() - enqueued_at
+            self.registry._record_wait(self.guild_id, wait)
+
+            token = _current_guild.set(self.guild_id)
+            try:
+                result = await factory()
+            except asyncio.CancelledError:
+                # A cancelled yt-dlp or voice call fails only this work item, unless the actor itself is being cancelled.
+                if not future.done():
+                    future.cancel()
+                if self.task.cancelling():
+                    raise
+            except BaseException as e:
+                if not future.done():
+                    future.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                _current_guild.reset(token)
+
+class GuildActorRegistry:
+    def __init__(self):
+        self._actors: Dict[int, GuildActor] = {}
+        self.processed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, guild_id: int, factory: Callable[[], Awaitable[Any]]) -> Any:
+        if _current_guild.get() == guild_id:
+            return await factory()
+
+        future = asyncio.get_running_loop().create_future()
+        actor = self._actors.get(guild_id)
+        if actor is None:
+            actor = GuildActor(guild_id, self)
+            self._actors[guild_id] = actor
+            actor.start()
+        actor.mailbox.put_nowait((time.perf_counter(), factory, future))
+        return await future
+
+    def _retire(self, actor: GuildActor):
+        if self._actors.get(actor.guild_id) is actor:
+            del self._actors[actor.guild_id]
+
+    def _record_wait(self, guild_id: int, wait: float):
+        self.processed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait >= SLOW_WAIT_SECONDS:
+            logger.warning(construct_log(f"Guild {guild_id} command waited {wait:.3f}s in its actor mailbox"))
+
+    def stats(self) -> Dict:
+        return {
+            'active_actors': len(self._actors),
+            'pending': sum(actor.mailbox.qsize() for actor in self._actors.values()),
+            'processed': self.processed,
+            'avg_wait': self.total_wait / self.processed if self.processed else 0.0,
+            'max_wait': self.max_wait
+        }
@@ -12,12 +12,26 @@ ffmpeg_options = {
     'options': '-vn'
 }
 
+FRAME_SECONDS = discord.opus.Encoder.FRAME_LENGTH / 1000
+
 class YoutubeDLAudioSource(discord.PCMVolumeTransformer):
-    def __init__(self, source, *, data, volume=0.5):
+    def __init__(self, source, *, data, volume=0.5, start_offset=0.0):
         super().__init__(source, volume)
         self.data = data
         self.title = data.get('title')
         self.url = ""
+        self.start_offset = start_offset
+        self.frames_read = 0
+
+    def read(self):
+        data = super().read()
+        if data:
+            self.frames_read += 1
+        return data
+
+    @property
+    def position(self) -> float:
+        return self.start_offset + self.frames_read * FRAME_SECONDS
 
     @classmethod
     def _is_youtube_url(cls, url):
@@ -25,7 +39,7 @@ class YoutubeDLAudioSource(discord.PCMVolumeTransformer):
         return 'youtube.com' in parsed.netloc or 'youtu.be' in parsed.netloc
 
     @classmethod
-    async def from_url(self, url, *, loop=None, stream=False, n=None):
+    async def from_url(self, url, *, loop=None, stream=False, n=None, start_offset=0.0):
         command = ["yt-dlp"]
         
         if self._is_youtube_url(url):
@@ -46,6 +60,10 @@ class YoutubeDLAudioSource(discord.PCMVolumeTransformer):
         
         limit = n
         
+        options = dict(ffmpeg_options)
+        if start_offset:
+            options['before_options'] = f"{options['before_options']} -ss {start_offset:.2f}"
+        
         last_error = None
         for format_selector in format_selectors:
             cmd = command + [
@@ -86,13 +104,14 @@ class YoutubeDLAudioSource(discord.PCMVolumeTransformer):
                         audio_source = self(
                             discord.FFmpegPCMAudio(
                                 stream_url,
-                                **ffmpeg_options
+                                **options
                             ),
                             data={
                                 'title': entry.get('title', 'No title'),
                                 'duration': format_duration(entry.get('duration', 0)),
                                 'url': entry_url
-                            }
+                            },
+                            start_offset=start_offset
                         )
                         audio_source.url = entry_url
                         results.append(audio_source)
@@ -109,3 +128,21 @@ class YoutubeDLAudioSource(discord.PCMVolumeTransformer):
             last_error = error_msg
         
         raise RuntimeError(last_error or "yt-dlp failed with all format selectors")
+
+
+class PendingTrack:
+    def __init__(self, data, start_offset=0.0):
+        self.data = data
+        self.title = data.get('title')
+        self.url = data.get('url', '')
+        self.start_offset = start_offset
+
+    @property
+    def position(self) -> float:
+        return self.start_offset
+
+    async def resolve(self, loop=None):
+        songs = await YoutubeDLAudioSource.from_url(self.url, loop=loop, n=1, start_offset=self.start_offset)
+        song = songs[0]
+        song.data.update(self.data)
+        return song
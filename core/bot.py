@@ -1,7 +1,10 @@
 import logging
 import asyncio
+import importlib
+import os
+import socket
+import sys
 import time
-import random
 import re
 
 import discord
@@ -11,159 +14,359 @@ from discord import app_commands
 from .audio import YoutubeDLAudioSource
 from .utils import (
     construct_log, validate_url,
-    join_voice_channel, construct_player_embed
+    join_voice_channel, construct_player_embed, player_render_key, get_rss_bytes,
+    command_tree_fingerprint, is_primary_process, parse_duration
 )
 from .database import PlaylistDatabase
 from .state import global_state
+from .session import SessionStore
+from .playlog import PlayLogWriter
+from .broadcast import AnnouncementBroadcaster
+from .retention import PlayLogMaintenance
+from .stats import TTLCache
 from .view import MediaControlView, PlayerView, construct_queue_menu, construct_media_buttons, construct_player_embed_for_interaction
 from .controller import (
     skip_logic, pause_logic, resume_logic, resolve_link_for_guild,
     play_logic, queue_logic, clear_logic, stop_logic, player_logic,
-    playlist_logic, add_logic, remove_logic, random_logic
+    playlist_logic, add_logic, remove_logic, random_logic,
+    top_logic, stats_logic
 )
-from agent.llm import LlmProvider
-from agent.embedding import EmbeddingClient
-from agent.memory import SemanticMemoryManager
 
 logger = logging.getLogger(__name__)
 
+COMMAND_TREE_SETTING = 'command_tree_fingerprint'
+MAINTENANCE_LEADER = 'maintenance'
+RELOAD_CHANNEL = 'music_reload'
+PROCESS_ID = f'{socket.gethostname()}:{os.getpid()}'
+
 
 class MusicBot(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.state = global_state
-        self.db = PlaylistDatabase()
-        self.embedding_client = EmbeddingClient()
-        self.memory_manager = SemanticMemoryManager(self.embedding_client, self.db)
-        self.llm = LlmProvider(memory_manager=self.memory_manager, db=self.db)
+        self._owns_db = getattr(bot, 'db', None) is None
+        self.db = PlaylistDatabase() if self._owns_db else bot.db
+        self.embedding_client = None
+        self.memory_manager = None
+        self.llm = None
+        self._agent_task = None
+        self.sessions = SessionStore(self.state, self.db)
+        self.play_log = PlayLogWriter(self.db)
+        self.broadcaster = AnnouncementBroadcaster(self.bot, self.db)
+        self.play_log_maintenance = PlayLogMaintenance(self.db)
+        self.stats_cache = TTLCache()
+        self._announcement_task = None
+        self._reload_task = None
+        self.player_views = {paused: PlayerView(self, paused=paused) for paused in (False, True)}
+        self.bot.add_view(self.player_views[False])
+        self._sessions_restored = False
         self.update_player_task.start()
-        self.idle_check_task.start()
+        self._deadline_task = None
+        self.persist_sessions_task.start()
+        self.flush_play_log_task.start()
+        self.leadership_task.start()
+        self.maintain_play_log_task.start()
+        self.evict_states_task.start()
 
     @commands.Cog.listener()
     async def on_ready(self):
+        ready_started = time.perf_counter()
+        if self._agent_task is None:
+            self._agent_task = asyncio.create_task(self._load_agent())
         try:
-            await self.db.connect()
+            if not self.db.pool:
+                await self.db.connect()
         except Exception as e:
             logger.error(f"Database connection failed: {e}. Playlist features will be unavailable.")
         logger.debug(construct_log(f'{self.bot.user} has connected to Discord!'))
+        if self.db.pool:
+            await self._listen_for_reloads()
+        
+        self._seed_voice_members()
+        self._start_deadline_runner()
         
         if self.db.pool:
-            for guild in self.bot.guilds:
-                await self.db.add_guild(guild.id)
-            logger.debug(construct_log(f'Registered {len(self.bot.guilds)} existing guild(s)'))
+            await self._register_guilds()
             
             version = getattr(self.bot, 'app_version', None)
             change_note = getattr(self.bot, 'change_note', '')
             
             if version and not await self.db.is_version_announced(version):
-                message_templates = [
-                    f"Tao vừa được cập nhật. Nhìn chung là:\n{{change_note}}",
-                    f"Update mới đây:\n{{change_note}}",
-                    f"Tao mới update xong. Thay đổi:\n{{change_note}}",
-                    f"Version mới ra lò:\n{{change_note}}",
-                    f"Tao vừa nâng cấp. Các thay đổi:\n{{change_note}}",
-                    f"Update time! Những gì mới:\n{{change_note}}",
-                    f"Tao đã được cập nhật. Chi tiết:\n{{change_note}}",
-                    f"Bản cập nhật mới:\n{{change_note}}"
-                ]
-                
-                guild_ids = await self.db.get_all_guilds()
-                for guild_id in guild_ids:
-                    try:
-                        guild = self.bot.get_guild(guild_id)
-                        if not guild:
-                            continue
-                        
-                        channel = guild.system_channel
-                        if not channel:
-                            text_channels = [ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages]
-                            if text_channels:
-                                channel = text_channels[0]
-                        
-                        if channel:
-                            template = random.choice(message_templates)
-                            message = template.format(change_note=change_note)
-                            await channel.send(message)
-                            logger.debug(construct_log(f'Sent version announcement to guild {guild_id}'))
-                    except Exception as e:
-                        logger.error(f"Error sending announcement to guild {guild_id}: {e}")
-                
-                await self.db.mark_version_announced(version)
-                logger.debug(construct_log(f'Marked version {version} as announced'))
+                if self._announcement_task is None or self._announcement_task.done():
+                    self._announcement_task = asyncio.create_task(self.broadcaster.run(version, change_note))
+            
+            if not self._sessions_restored:
+                self._sessions_restored = True
+                asyncio.create_task(self.sessions.restore(self.bot, self.play_next))
         
-        await asyncio.sleep(1)
+        synced = await self._sync_commands_once()
+        logger.info(construct_log(f'Startup finished in {time.perf_counter() - ready_started:.2f}s ({"with" if synced else "without"} command sync)'))
+        self._log_startup_breakdown()
+
+    def _log_startup_breakdown(self):
+        started_at = getattr(self.bot, 'started_at', None)
+        if started_at is None:
+            return
+        timings = getattr(self.bot, 'startup_timings', {})
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+        logger.info(construct_log(f'Ready {time.perf_counter() - started_at:.2f}s after process start ({steps})'))
+
+    async def _load_agent(self):
+        started = time.perf_counter()
+        try:
+            llm_module, embedding_module, memory_module = await asyncio.to_thread(
+                lambda: tuple(importlib.import_module(name) for name in ('agent.llm', 'agent.embedding', 'agent.memory'))
+            )
+            self.embedding_client = embedding_module.EmbeddingClient()
+            self.memory_manager = memory_module.SemanticMemoryManager(self.embedding_client, self.db)
+            self.llm = llm_module.LlmProvider(memory_manager=self.memory_manager, db=self.db)
+        except Exception as e:
+            logger.error(construct_log(f'Failed to load agent stack: {e}'))
+            return
+        logger.info(construct_log(f'Agent stack loaded in {time.perf_counter() - started:.2f}s'))
+
+    async def _sync_commands_once(self) -> bool:
+        if not self.db.pool:
+            return await self._sync_commands() if is_primary_process(self.bot) else False
+        async with self.db.singleton('command_sync') as acquired:
+            return await self._sync_commands() if acquired else False
+
+    async def _sync_commands(self, force: bool = False) -> bool:
+        fingerprint = command_tree_fingerprint(self.bot.tree)
+        setting_key = f'{COMMAND_TREE_SETTING}:{self.bot.application_id}'
+        if not force and self.db.pool and await self.db.get_setting(setting_key) == fingerprint:
+            logger.debug(construct_log('Command tree unchanged, skipping sync'))
+            return False
         
+        started = time.perf_counter()
         try:
-            all_commands = [cmd.name for cmd in self.bot.tree.get_commands()]
-            logger.debug(construct_log(f'Commands in tree before sync: {", ".join(all_commands)}'))
-            if 'random' not in all_commands:
-                logger.warning(construct_log('WARNING: /random command not found in command tree before sync!'))
-                for cmd in self.bot.tree.get_commands():
-                    if hasattr(cmd, 'name'):
-                        logger.debug(construct_log(f'Found command: {cmd.name}'))
-            
             synced = await self.bot.tree.sync()
-            synced_names = [cmd.name for cmd in synced]
-            logger.debug(construct_log(f'Synced {len(synced)} command(s): {", ".join(synced_names)}'))
-            if 'random' not in synced_names:
-                logger.warning(construct_log('WARNING: /random command was not synced!'))
-                logger.warning(construct_log('Attempting to force sync all commands...'))
-                try:
-                    await self.bot.tree.sync()
-                except Exception as sync_error:
-                    logger.error(construct_log(f'Force sync failed: {sync_error}'))
         except Exception as e:
             logger.error(construct_log(f'Failed to sync commands: {e}'))
+            return False
+        logger.info(construct_log(f'Synced {len(synced)} command(s) in {time.perf_counter() - started:.2f}s: {", ".join(cmd.name for cmd in synced)}'))
+        if self.db.pool:
+            await self.db.set_setting(setting_key, fingerprint)
+        return True
+
+    @commands.command(name='sync')
+    @commands.is_owner()
+    async def commands_sync(self, ctx: commands.Context):
+        synced = await self._sync_commands(force=True)
+        await ctx.send(embed=discord.Embed(description="Đã đồng bộ lệnh" if synced else "Đồng bộ lệnh thất bại"))
+
+    @commands.command(name='reload')
+    @commands.is_owner()
+    async def commands_reload(self, ctx: commands.Context):
+        started = time.perf_counter()
+        try:
+            await reload_music_extension(self.bot)
+        except Exception as e:
+            logger.error(construct_log(f'Reload failed, kept the running code: {e}'))
+            await ctx.send(embed=discord.Embed(description=f"Reload thất bại: {e}"))
+            return
+        
+        cog = self.bot.get_cog(type(self).__name__)
+        synced = await cog._sync_commands_once()
+        logger.info(construct_log(f'Reloaded in {time.perf_counter() - started:.2f}s ({"with" if synced else "without"} command sync)'))
+        # Shard processes started by launcher.py each run their own copy of the code.
+        if await cog.db.notify(RELOAD_CHANNEL, PROCESS_ID):
+            description = "Đã reload process này và gửi yêu cầu reload tới các process khác."
+        else:
+            description = "Đã reload process này, nhưng không gửi được yêu cầu reload tới các process khác."
+        description += f" Không reload: {', '.join(RELOAD_PERSISTENT)} (cần khởi động lại)."
+        await ctx.send(embed=discord.Embed(description=description))
+
+    async def _listen_for_reloads(self):
+        await self.db.listen(RELOAD_CHANNEL, self._on_reload_notice)
+
+    def _on_reload_notice(self, origin: str):
+        if origin == PROCESS_ID:
+            return
+        self._reload_task = asyncio.create_task(self._reload_on_notice(origin))
+
+    async def _reload_on_notice(self, origin: str):
+        started = time.perf_counter()
+        try:
+            await reload_music_extension(self.bot)
+        except Exception as e:
+            logger.error(construct_log(f'Reload requested by {origin} failed, kept the running code: {e}'))
+            return
+        logger.info(construct_log(f'Reloaded on request from {origin} in {time.perf_counter() - started:.2f}s'))
+
+    def _reattach_player_views(self):
+        # A view sent with a message is stored under that message id and wins over the views added in
+        # __init__, so live player messages would keep calling into the previous cog instance.
+        for guild_id in self.state.guild_ids():
+            message = self.state.get_player_message(guild_id)
+            if message is None:
+                continue
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild.voice_client if guild else None
+            self.bot.add_view(self.player_view(bool(voice_client and voice_client.is_paused())), message_id=message.id)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if self.bot.user in message.mentions:
             content = re.sub(r'<@!?\d+>', '', message.content).strip()
+            if self._agent_task is None:
+                self._agent_task = asyncio.create_task(self._load_agent())
+            await asyncio.shield(self._agent_task)
+            if self.llm is None:
+                return
             response = await self.llm.handle_message(content, interaction=None, message_obj=message)
             if response is not None:
                 await message.channel.send(response)
         
+    async def _register_guilds(self):
+        new_guild_ids = {guild.id for guild in self.bot.guilds} - self.state.known_guilds
+        if not new_guild_ids:
+            return
+        started = time.perf_counter()
+        if await self.db.add_guilds(list(new_guild_ids)):
+            self.state.known_guilds.update(new_guild_ids)
+            logger.debug(construct_log(f'Registered {len(new_guild_ids)} new guild(s) in {(time.perf_counter() - started) * 1000:.1f}ms'))
+
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild):
         if self.db.pool:
+            if guild.id in self.state.known_guilds:
+                return
             success = await self.db.add_guild(guild.id)
             if success:
+                self.state.known_guilds.add(guild.id)
                 logger.info(f"Added guild {guild.id} ({guild.name}) to database")
             else:
                 logger.error(f"Failed to add guild {guild.id} ({guild.name}) to database")
         else:
             logger.warning(f"Database not available, could not add guild {guild.id} ({guild.name})")
 
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        await self.sessions.forget(guild.id)
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
-        if member.bot:
+        guild = member.guild
+        if not guild or before.channel == after.channel:
             return
         
-        guild = member.guild
-        if not guild:
+        if member.bot:
+            if self.bot.user and member.id == self.bot.user.id:
+                self._on_bot_voice_moved(guild, before, after)
             return
         
+        if before.channel:
+            self.state.adjust_voice_members(before.channel.id, -1)
+        if after.channel:
+            self.state.adjust_voice_members(after.channel.id, 1)
+        self._check_voice_channel_empty(guild)
+
+    def _on_bot_voice_moved(self, guild: discord.Guild, before: discord.VoiceState, after: discord.VoiceState):
         guild_id = guild.id
-        voice_client = guild.voice_client
-        
-        if not voice_client or not voice_client.is_connected():
+        if not after.channel:
+            self.state.clear_idle_start_time(guild_id)
+            self.state.clear_all_users_disconnected_time(guild_id)
             return
         
-        if voice_client.channel is None:
-            return
+        if self.state.get_voice_members(after.channel.id) == 0:
+            self.state.set_all_users_disconnected_time(guild_id, time.time())
+        else:
+            self.state.clear_all_users_disconnected_time(guild_id)
         
-        members_in_channel = [m for m in voice_client.channel.members if not m.bot]
+        voice_client = guild.voice_client
+        is_playing = voice_client and (voice_client.is_playing() or voice_client.is_paused())
+        if not before.channel and not is_playing and len(self.state.get_queue(guild_id)) == 0:
+            self.state.set_idle_start_time(guild_id, time.time())
+
+    def _check_voice_channel_empty(self, guild: discord.Guild):
+        voice_client = guild.voice_client
+        if not voice_client or not voice_client.is_connected() or voice_client.channel is None:
+            return
         
-        if len(members_in_channel) == 0:
-            self.state.set_all_users_disconnected_time(guild_id, time.time())
+        if self.state.get_voice_members(voice_client.channel.id) == 0:
+            if not self.state.get_all_users_disconnected_time(guild.id):
+                self.state.set_all_users_disconnected_time(guild.id, time.time())
         else:
+            self.state.clear_all_users_disconnected_time(guild.id)
+
+    def _seed_voice_members(self):
+        counts = {}
+        for guild in self.bot.guilds:
+            for channel in guild.voice_channels:
+                # voice_states does not need the member cache; members we have not cached are counted as people.
+                counts[channel.id] = sum(
+                    1 for user_id in channel.voice_states
+                    if not getattr(guild.get_member(user_id), 'bot', False)
+                )
+        self.state.reset_voice_members(counts)
+
+    async def _on_disconnect_deadline(self, key):
+        guild_id, reason = key
+        
+        async def disconnect_if_idle():
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild.voice_client if guild else None
+            if not voice_client or not voice_client.is_connected():
+                self.state.clear_idle_start_time(guild_id)
+                self.state.clear_all_users_disconnected_time(guild_id)
+                return
+            
+            if voice_client.is_playing() or voice_client.is_paused() or len(self.state.get_queue(guild_id)) > 0:
+                if reason == 'idle':
+                    self.state.clear_idle_start_time(guild_id)
+                return
+            
+            if reason == 'empty' and voice_client.channel and self.state.get_voice_members(voice_client.channel.id) > 0:
+                self.state.clear_all_users_disconnected_time(guild_id)
+                return
+            
+            await voice_client.disconnect()
+            self.state.clear_idle_start_time(guild_id)
             self.state.clear_all_users_disconnected_time(guild_id)
+            if reason == 'empty':
+                logger.debug(construct_log(f"Disconnected from voice channel in guild {guild_id} after all users left for 3 minutes"))
+            else:
+                logger.debug(construct_log(f"Disconnected from voice channel in guild {guild_id} after 3 minutes of idle"))
+        
+        await self.state.actors.run(guild_id, disconnect_if_idle)
+
+    async def cog_load(self):
+        if not self.bot.is_ready():
+            return
+        # Loaded by !reload: on_ready will not fire again, so pick up where the previous instance left off.
+        self._sessions_restored = True
+        self._start_deadline_runner()
+        self._reattach_player_views()
+        self._agent_task = asyncio.create_task(self._load_agent())
+        await self._listen_for_reloads()
+
+    def _start_deadline_runner(self):
+        if self._deadline_task is None or self._deadline_task.done():
+            self._deadline_task = asyncio.create_task(self.state.deadlines.run(self._on_disconnect_deadline))
 
     def cog_unload(self):
         self.update_player_task.cancel()
-        self.idle_check_task.cancel()
+        if self._deadline_task:
+            self._deadline_task.cancel()
+        if self._announcement_task:
+            self._announcement_task.cancel()
+        self.persist_sessions_task.cancel()
+        self.flush_play_log_task.cancel()
+        self.leadership_task.cancel()
+        self.maintain_play_log_task.cancel()
+        self.evict_states_task.cancel()
         if self.bot.loop and not self.bot.loop.is_closed():
-            asyncio.run_coroutine_threadsafe(self.db.close(), self.bot.loop)
+            asyncio.run_coroutine_threadsafe(self._close_db(), self.bot.loop)
+
+    async def _close_db(self):
+        await self.db.unlisten(RELOAD_CHANNEL, self._on_reload_notice)
+        await self.play_log.flush()
+        if self._owns_db:
+            await self.db.close()
+
+    def player_view(self, paused: bool = False) -> PlayerView:
+        return self.player_views[bool(paused)]
 
     async def join(self, interaction: discord.Interaction):
         return await join_voice_channel(interaction)
@@ -191,17 +394,25 @@ class MusicBot(commands.Cog):
         self.state.clear_idle_start_time(guild_id)
         
         song = queue.pop(0)
+        if hasattr(song, 'resolve'):
+            try:
+                song = await song.resolve(self.bot.loop)
+            except Exception as e:
+                logger.error(f"Error resolving queued track {song.url}: {e}")
+                await self.play_next(interaction, channel)
+                return
+        song.render_token = self.state.next_track_token()
+
+        url = song.data.get('url') or getattr(song, 'url', None)
+        if url:
+            self.play_log.record(
+                guild_id,
+                url,
+                song.data.get('title', 'Unknown'),
+                song.data.get('requester_id'),
+                parse_duration(song.data.get('duration', '00:00'))
+            )
 
-        if self.db.pool:
-            url = song.data.get('url') or getattr(song, 'url', None)
-            title = song.data.get('title', 'Unknown')
-            if url:
-                await self.db.log_played_url(guild_id, url, title)
-
-        self.state.set_playback_start_time(guild_id, time.time())
-        self.state.set_total_paused_time(guild_id, 0)
-        self.state.set_pause_start_time(guild_id, None)
-        
         voice_client = guild.voice_client
         
         if not voice_client:
@@ -222,9 +433,7 @@ class MusicBot(commands.Cog):
                 elif interaction.user and interaction.user.voice and interaction.user.voice.channel:
                     target_channel = interaction.user.voice.channel
                 else:
-                    members_in_voice = [m for m in guild.members if m.voice and m.voice.channel]
-                    if members_in_voice:
-                        target_channel = members_in_voice[0].voice.channel
+                    target_channel = next((ch for ch in guild.voice_channels if self.state.get_voice_members(ch.id) > 0), None)
                 
                 if target_channel:
                     try:
@@ -246,24 +455,19 @@ class MusicBot(commands.Cog):
                     pass
                 return
         
+        self._check_voice_channel_empty(guild)
+        
         embed = construct_player_embed(
             song=song,
             voice_client=voice_client,
             state=self.state,
-            guild_id=guild_id,
-            playback_start_time=self.state,
-            total_paused_time=self.state,
-            pause_start_time=self.state
+            guild_id=guild_id
         )
-        view = PlayerView(self, interaction)
-        for item in view.children:
-            if isinstance(item, discord.ui.Button) and item.emoji in ['⏸️', '▶️']:
-                if voice_client and voice_client.is_paused():
-                    item.emoji = '▶️'
-                else:
-                    item.emoji = '⏸️'
+        view = self.player_view(False)
 
         target_channel = channel or getattr(interaction, 'channel', None)
+        if target_channel:
+            self.state.set_text_channel_id(guild_id, target_channel.id)
         message = None
         
         existing_message = self.state.get_player_message(guild_id)
@@ -284,15 +488,45 @@ class MusicBot(commands.Cog):
             if message:
                 self.state.set_player_message(guild_id, message, interaction)
 
+        next_channel = channel or getattr(interaction, 'channel', None)
+        seq = self.state.handoffs.begin(guild_id)
+
         def after_play(error):
-            coro = self.play_next(interaction, channel or getattr(interaction, 'channel', None))
-            fut = asyncio.run_coroutine_threadsafe(coro, self.bot.loop)
-            try:
-                fut.result()
-            except:
-                pass
+            ended_at = time.perf_counter()
+            if error:
+                logger.error(f"Player error in guild {guild_id}: {error}")
+            fut = asyncio.run_coroutine_threadsafe(
+                self._handoff(guild_id, seq, ended_at, interaction, next_channel),
+                self.bot.loop
+            )
+            fut.add_done_callback(lambda f: self._log_handoff_failure(f, guild_id))
 
         voice_client.play(song, after=after_play)
+        if message:
+            self.state.player_updates.record_edit(guild_id, player_render_key(self.state, guild_id, voice_client))
+            self.state.set_player_content_sent(guild_id, (embed.description, False))
+
+    async def _handoff(self, guild_id: int, seq: int, ended_at: float, interaction, channel):
+        cog = self.bot.get_cog(type(self).__name__) or self
+        handoffs = self.state.handoffs
+
+        async def advance():
+            if not handoffs.is_current(guild_id, seq):
+                handoffs.record_stale()
+                return
+            handoffs.track_ended(guild_id, ended_at)
+            try:
+                await cog.play_next(interaction, channel)
+            finally:
+                handoffs.settle(guild_id)
+
+        await self.state.actors.run(guild_id, advance)
+
+    def _log_handoff_failure(self, future, guild_id: int):
+        if future.cancelled() or not future.exception():
+            return
+        self.state.handoffs.record_failure()
+        logger.error(construct_log(f"Track handoff for guild {guild_id} failed: {future.exception()}"))
 
     async def __construct_media_buttons(self, interaction, metadata):
         return construct_media_buttons(
@@ -342,7 +576,7 @@ class MusicBot(commands.Cog):
         if not guild:
             await interaction.followup.send(embed=discord.Embed(description="Lỗi: Không tìm thấy server"))
             return
-        await skip_logic(interaction, self.state, guild.id)
+        await self.state.actors.run(guild.id, lambda: skip_logic(interaction, self.state, guild.id))
 
     @app_commands.command(name='skip', description='Bỏ qua bài hát')
     async def commands_skip(self, interaction: discord.Interaction):
@@ -355,7 +589,7 @@ class MusicBot(commands.Cog):
         if not guild:
             await interaction.followup.send(embed=discord.Embed(description="Lỗi: Không tìm thấy server"))
             return
-        await pause_logic(interaction, self.state, guild.id)
+        await self.state.actors.run(guild.id, lambda: pause_logic(interaction, self.state, guild.id))
 
     @app_commands.command(name='pause', description='Tạm dừng bài hát')
     async def commands_pause(self, interaction: discord.Interaction):
@@ -368,7 +602,7 @@ class MusicBot(commands.Cog):
         if not guild:
             await interaction.followup.send(embed=discord.Embed(description="Lỗi: Không tìm thấy server"))
             return
-        await resume_logic(interaction, self.state, guild.id)
+        await self.state.actors.run(guild.id, lambda: resume_logic(interaction, self.state, guild.id))
 
     @app_commands.command(name='resume', description='Tiếp tục bài hát')
     async def commands_resume(self, interaction: discord.Interaction):
@@ -392,7 +626,7 @@ class MusicBot(commands.Cog):
         if not guild:
             await interaction.followup.send(embed=discord.Embed(description="Lỗi: Không tìm thấy server"))
             return
-        await clear_logic(interaction, self.state, guild.id)
+        await self.state.actors.run(guild.id, lambda: clear_logic(interaction, self.state, guild.id))
 
     @app_commands.command(name='stop', description='Dừng bài hát')
     async def commands_stop(self, interaction: discord.Interaction):
@@ -401,49 +635,52 @@ class MusicBot(commands.Cog):
         if not guild:
             await interaction.followup.send(embed=discord.Embed(description="Lỗi: Không tìm thấy server"))
             return
-        await stop_logic(interaction, guild.id)
+        await self.state.actors.run(guild.id, lambda: stop_logic(interaction, guild.id))
 
     async def construct_player_embed(self, interaction: discord.Interaction, song=None):
         return await construct_player_embed_for_interaction(
             interaction,
             song,
-            self.state,
-            self.state,
-            self.state,
             self.state
         )
 
-    @tasks.loop(seconds=3.0)
+    def _player_voice_client(self, guild_id: int):
+        interaction = self.state.get_player_interaction(guild_id)
+        guild = interaction.guild if interaction else None
+        return guild.voice_client if guild else None
+
+    @tasks.loop(seconds=1.0)
     async def update_player_task(self):
-        for guild_id in list(self.state._states.keys()):
+        updates = self.state.player_updates
+        for guild_id in self.state.player_guild_ids():
+            voice_client = self._player_voice_client(guild_id)
+            if not voice_client or (not voice_client.is_playing() and not voice_client.is_paused()):
+                if not voice_client or not voice_client.is_connected() or len(self.state.get_queue(guild_id)) == 0:
+                    self.state.clear_player_message(guild_id)
+                continue
+            updates.observe(guild_id, player_render_key(self.state, guild_id, voice_client))
+
+        for guild_id in updates.due():
             try:
                 message = self.state.get_player_message(guild_id)
                 interaction = self.state.get_player_interaction(guild_id)
-                
-                if not message or not interaction:
-                    continue
-                
-                guild = interaction.guild
-                if not guild:
-                    self.state.clear_player_message(guild_id)
+                voice_client = self._player_voice_client(guild_id)
+                if not message or not interaction or not voice_client:
                     continue
                 
-                voice_client = guild.voice_client
-                if not voice_client or (not voice_client.is_playing() and not voice_client.is_paused()):
-                    self.state.clear_player_message(guild_id)
-                    continue
-
+                key = player_render_key(self.state, guild_id, voice_client)
                 embed = await self.construct_player_embed(interaction)
-                view = PlayerView(self, interaction)
-                
-                for item in view.children:
-                    if isinstance(item, discord.ui.Button) and item.emoji in ['⏸️', '▶️']:
-                        if voice_client.is_paused():
-                            item.emoji = '▶️'
-                        else:
-                            item.emoji = '⏸️'
-
-                await message.edit(embed=embed, view=view)
+                content = (embed.description, voice_client.is_paused())
+                sent = self.state.get_player_content_sent(guild_id)
+                if sent == content:
+                    updates.record_identical(guild_id, key)
+                    continue
+                if sent and sent[1] == content[1]:
+                    await message.edit(embed=embed)
+                else:
+                    await message.edit(embed=embed, view=self.player_view(content[1]))
+                updates.record_edit(guild_id, key)
+                self.state.set_player_content_sent(guild_id, content)
             except (discord.NotFound, discord.HTTPException, AttributeError) as e:
                 self.state.clear_player_message(guild_id)
 
@@ -451,66 +688,75 @@ class MusicBot(commands.Cog):
     async def before_update_player_task(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(seconds=5.0)
+    async def persist_sessions_task(self):
+        if self.db.pool:
+            await self.sessions.flush(self.bot)
+
+    @persist_sessions_task.before_loop
+    async def before_persist_sessions_task(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=5.0)
+    async def flush_play_log_task(self):
+        await self.play_log.flush()
+
+    @flush_play_log_task.before_loop
+    async def before_flush_play_log_task(self):
+        await self.bot.wait_until_ready()
+
     @tasks.loop(seconds=30.0)
-    async def idle_check_task(self):
-        current_time = time.time()
-        for guild_id in list(self.state._states.keys()):
-            try:
-                guild = self.bot.get_guild(guild_id)
-                if not guild:
-                    self.state.clear_idle_start_time(guild_id)
-                    self.state.clear_all_users_disconnected_time(guild_id)
-                    continue
-                
-                voice_client = guild.voice_client
-                if not voice_client or not voice_client.is_connected():
-                    self.state.clear_idle_start_time(guild_id)
-                    self.state.clear_all_users_disconnected_time(guild_id)
-                    continue
-                
-                queue = self.state.get_queue(guild_id)
-                is_playing = voice_client.is_playing() or voice_client.is_paused()
-                
-                if is_playing or len(queue) > 0:
-                    self.state.clear_idle_start_time(guild_id)
-                    continue
-                
-                if voice_client.channel:
-                    members_in_channel = [m for m in voice_client.channel.members if not m.bot]
-                    if len(members_in_channel) == 0:
-                        all_users_disconnected_time = self.state.get_all_users_disconnected_time(guild_id)
-                        if not all_users_disconnected_time:
-                            self.state.set_all_users_disconnected_time(guild_id, current_time)
-                        else:
-                            disconnected_duration = current_time - all_users_disconnected_time
-                            if disconnected_duration >= 180:
-                                await voice_client.disconnect()
-                                self.state.clear_all_users_disconnected_time(guild_id)
-                                self.state.clear_idle_start_time(guild_id)
-                                logger.debug(construct_log(f"Disconnected from voice channel in guild {guild_id} after all users left for 3 minutes"))
-                                continue
-                    else:
-                        self.state.clear_all_users_disconnected_time(guild_id)
-                
-                idle_start = self.state.get_idle_start_time(guild_id)
-                if not idle_start:
-                    if not is_playing and len(queue) == 0:
-                        self.state.set_idle_start_time(guild_id, current_time)
-                    continue
-                
-                idle_duration = current_time - idle_start
-                if idle_duration >= 180:
-                    await voice_client.disconnect()
-                    self.state.clear_idle_start_time(guild_id)
-                    self.state.clear_all_users_disconnected_time(guild_id)
-                    logger.debug(construct_log(f"Disconnected from voice channel in guild {guild_id} after 3 minutes of idle"))
-            except Exception as e:
-                logger.error(construct_log(f"Error in idle check for guild {guild_id}: {e}"))
-                self.state.clear_idle_start_time(guild_id)
-                self.state.clear_all_users_disconnected_time(guild_id)
+    async def leadership_task(self):
+        # Fleet-wide jobs check db.is_leader(MAINTENANCE_LEADER); a follower takes over once the leader's connection drops.
+        if self.db.pool:
+            await self.db.acquire_leadership(MAINTENANCE_LEADER)
+            await self._listen_for_reloads()
 
-    @idle_check_task.before_loop
-    async def before_idle_check_task(self):
+    @leadership_task.before_loop
+    async def before_leadership_task(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(hours=1.0)
+    async def maintain_play_log_task(self):
+        if self.db.pool and self.db.is_leader(MAINTENANCE_LEADER):
+            await self.play_log.replay_orphaned_spools()
+            await self.play_log_maintenance.run()
+
+    @maintain_play_log_task.before_loop
+    async def before_maintain_play_log_task(self):
+        await self.bot.wait_until_ready()
+        # Give leadership_task a chance to win the election before the first run.
+        await asyncio.sleep(5)
+
+    @tasks.loop(seconds=60.0)
+    async def evict_states_task(self):
+        def is_connected(guild_id):
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild.voice_client if guild else None
+            return bool(voice_client and voice_client.is_connected())
+        
+        evicted = self.state.evict_idle_states(is_connected)
+        for guild_id in evicted:
+            await self.sessions.forget(guild_id)
+        stats = self.state.stats()
+        logger.debug(construct_log(f"Evicted {len(evicted)} idle guild state(s); {stats['live_states']} live, ~{stats['approx_bytes'] / 1024:.1f} KiB, {stats['queued_tracks']} queued track(s)"))
+        actor_stats = self.state.actors.stats()
+        logger.debug(construct_log(f"Guild actors: {actor_stats['active_actors']} active, {actor_stats['pending']} pending, {actor_stats['processed']} processed, avg wait {actor_stats['avg_wait'] * 1000:.1f}ms, max wait {actor_stats['max_wait'] * 1000:.1f}ms"))
+        update_stats = self.state.player_updates.stats()
+        logger.debug(construct_log(f"Player updates: {update_stats['edits']} edits, {update_stats['coalesced']} coalesced, {update_stats['skipped']} skipped, {update_stats['deferred']} deferred, {update_stats['identical']} identical, {update_stats['pending']} pending"))
+        logger.debug(construct_log(f"Memory: RSS {get_rss_bytes() / (1024 * 1024):.1f} MiB, {len(self.bot.persistent_views)} persistent view(s)"))
+        logger.debug(construct_log(f"Disconnect deadlines armed: {len(self.state.deadlines)}"))
+        play_log_stats = self.play_log.stats()
+        logger.debug(construct_log(f"Play log: {play_log_stats['buffered']} buffered, {play_log_stats['spooled']} spooled, {play_log_stats['flushed']} flushed, avg flush {play_log_stats['avg_flush'] * 1000:.1f}ms, max flush {play_log_stats['max_flush'] * 1000:.1f}ms"))
+        for query in self.db.query_stats.top():
+            logger.debug(construct_log(f"DB query {query['name']}: {query['calls']} call(s), {query['errors']} error(s), total {query['total'] * 1000:.0f}ms, avg {query['avg'] * 1000:.1f}ms, max {query['max'] * 1000:.1f}ms"))
+        cache_stats = self.stats_cache.stats()
+        logger.debug(construct_log(f"Stats cache: {cache_stats['entries']} entries, {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es)"))
+        handoff_stats = self.state.handoffs.stats()
+        logger.debug(construct_log(f"Track handoffs: {handoff_stats['handoffs']} completed, {handoff_stats['stale']} stale, {handoff_stats['failed']} failed, avg {handoff_stats['avg_latency'] * 1000:.1f}ms, max {handoff_stats['max_latency'] * 1000:.1f}ms"))
+
+    @evict_states_task.before_loop
+    async def before_evict_states_task(self):
         await self.bot.wait_until_ready()
 
     @app_commands.command(name='player', description='Hiển thị player với progress và danh sách chờ')
@@ -520,7 +766,7 @@ class MusicBot(commands.Cog):
             interaction,
             self.state,
             self.construct_player_embed,
-            lambda inter: PlayerView(self, inter)
+            self.player_view
         )
 
     @app_commands.command(name='playlist', description='Xem playlist cá nhân')
@@ -546,8 +792,16 @@ class MusicBot(commands.Cog):
         await self.commands_play.callback(self, interaction, url="personal")
 
     @app_commands.command(name='random', description='Phát bài hát ngẫu nhiên từ lịch sử của server')
-    @app_commands.describe(number_of_urls='Số lượng bài hát muốn phát (mặc định: 1)')
-    async def commands_random(self, interaction: discord.Interaction, number_of_urls: int = 1):
+    @app_commands.describe(
+        number_of_urls='Số lượng bài hát muốn phát (mặc định: 1)',
+        weighting='Cách chọn bài (mặc định: ngẫu nhiên đều)'
+    )
+    @app_commands.choices(weighting=[
+        app_commands.Choice(name='Ngẫu nhiên', value='uniform'),
+        app_commands.Choice(name='Nghe nhiều', value='popular'),
+        app_commands.Choice(name='Nghe gần đây', value='recent')
+    ])
+    async def commands_random(self, interaction: discord.Interaction, number_of_urls: int = 1, weighting: str = 'uniform'):
         await interaction.response.defer()
         await random_logic(
             interaction,
@@ -556,5 +810,53 @@ class MusicBot(commands.Cog):
             self.db,
             self.resolve_link,
             self.construct_queue_menu,
-            self.play_next
+            self.play_next,
+            weighting
         )
+
+    @app_commands.command(name='top', description='Bài hát được nghe nhiều nhất')
+    @app_commands.describe(
+        member='Xem bài hát một thành viên nghe nhiều nhất (mặc định: cả server)',
+        days='Khoảng thời gian (mặc định: từ trước đến nay)'
+    )
+    @app_commands.choices(days=[
+        app_commands.Choice(name='Từ trước đến nay', value=0),
+        app_commands.Choice(name='7 ngày qua', value=7),
+        app_commands.Choice(name='30 ngày qua', value=30)
+    ])
+    @app_commands.guild_only()
+    async def commands_top(self, interaction: discord.Interaction, member: discord.Member = None, days: int = 0):
+        await interaction.response.defer()
+        await top_logic(interaction, self.db, self.stats_cache, member, days)
+
+    @app_commands.command(name='stats', description='Thống kê nghe nhạc')
+    @app_commands.describe(member='Xem thống kê của một thành viên (mặc định: cả server)')
+    @app_commands.guild_only()
+    async def commands_stats(self, interaction: discord.Interaction, member: discord.Member = None):
+        await interaction.response.defer()
+        await stats_logic(interaction, self.db, self.stats_cache, member)
+
+
+RELOAD_PACKAGES = ('core.', 'agent.')
+# core.state holds the queues plus the live actor, timer, player-update and handoff helpers. Those
+# objects would keep running their old code whatever is re-imported, so their modules stay loaded
+# too and changes to them need a restart.
+RELOAD_PERSISTENT = ('core.state', 'core.actor', 'core.timers', 'core.scheduler', 'core.playback')
+RELOAD_KEEP = set(RELOAD_PERSISTENT) | {'core.bot'}
+
+async def reload_music_extension(bot):
+    # Every other core/agent module is re-imported; core.bot itself is reloaded by discord.py.
+    stale = {
+        name: module for name, module in sys.modules.items()
+        if name.startswith(RELOAD_PACKAGES) and name not in RELOAD_KEEP
+    }
+    for name in stale:
+        del sys.modules[name]
+    try:
+        await bot.reload_extension(__name__)
+    except Exception:
+        sys.modules.update(stale)
+        raise
+
+async def setup(bot):
+    await bot.add_cog(MusicBot(bot))
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+import discord
+
+from .scheduler import TokenBucket
+from .utils import construct_log, owns_guild
+
+logger = logging.getLogger(__name__)
+
+ANNOUNCE_CONCURRENCY = 5
+ANNOUNCE_SENDS_PER_SECOND = 10.0
+ANNOUNCE_RETRY_INTERVAL = 300
+ANNOUNCE_CLAIM_TIMEOUT = 600
+
+MESSAGE_TEMPLATES = [
+    "Tao vừa được cập nhật. Nhìn chung là:\n{change_note}",
+    "Update mới đây:\n{change_note}",
+    "Tao mới update xong. Thay đổi:\n{change_note}",
+    "Version mới ra lò:\n{change_note}",
+    "Tao vừa nâng cấp. Các thay đổi:\n{change_note}",
+    "Update time! Những gì mới:\n{change_note}",
+    "Tao đã được cập nhật. Chi tiết:\n{change_note}",
+    "Bản cập nhật mới:\n{change_note}"
+]
+
+def announcement_channel(guild: discord.Guild) -> Optional[discord.TextChannel]:
+    channel = guild.system_channel
+    if channel and channel.permissions_for(guild.me).send_messages:
+        return channel
+    for text_channel in guild.text_channels:
+        if text_channel.permissions_for(guild.me).send_messages:
+            return text_channel
+    return None
+
+class AnnouncementBroadcaster:
+    """Delivers a release note to every registered guild, recording each delivery so a restart resumes where it stopped."""
+
+    def __init__(self, bot, db, concurrency: int = ANNOUNCE_CONCURRENCY, sends_per_second: float = ANNOUNCE_SENDS_PER_SECOND):
+        self.bot = bot
+        self.db = db
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(sends_per_second, concurrency)
+
+    async def run(self, version: str, change_note: str):
+        while True:
+            started = time.perf_counter()
+            delivered = set(await self.db.get_announced_guilds(version))
+            pending = [
+                guild_id for guild_id in await self.db.get_all_guilds()
+                if guild_id not in delivered and owns_guild(self.bot, guild_id)
+            ]
+
+            retry = 0
+            if pending:
+                results = []
+                guild_ids = iter(pending)
+                await asyncio.gather(*(
+                    self._worker(version, change_note, guild_ids, results)
+                    for _ in range(min(self.concurrency, len(pending)))
+                ))
+                sent = results.count('sent')
+                retry = results.count(None)
+                logger.info(construct_log(f"Announced version {version}: {sent} sent, {len(results) - sent - retry} skipped, {retry} to retry, {time.perf_counter() - started:.1f}s"))
+
+            # Other shard processes announce to their own guilds; the version is closed once every guild has an outcome.
+            remaining = set(await self.db.get_all_guilds()) - set(await self.db.get_announced_guilds(version))
+            if not remaining:
+                await self.db.mark_version_announced(version)
+                logger.debug(construct_log(f'Marked version {version} as announced'))
+                return
+            if not retry:
+                return
+            await asyncio.sleep(ANNOUNCE_RETRY_INTERVAL)
+
+    async def _worker(self, version: str, change_note: str, guild_ids, results: list):
+        for guild_id in guild_ids:
+            results.append(await self._deliver(version, change_note, guild_id))
+
+    async def _deliver(self, version: str, change_note: str, guild_id: int) -> Optional[str]:
+        guild = self.bot.get_guild(guild_id)
+        # An outage or a shard still connecting is not the same as having left the guild.
+        if (guild and guild.unavailable) or (not guild and not self.bot.is_ready()):
+            return None
+
+        # Another process may be sending to this guild; a claim older than the timeout is taken over.
+        if not await self.db.claim_guild_announcement(version, guild_id, ANNOUNCE_CLAIM_TIMEOUT):
+            return None
+
+        if not guild:
+            return await self._record(version, guild_id, 'missing')
+
+        channel = announcement_channel(guild)
+        if not channel:
+            return await self._record(version, guild_id, 'no_channel')
+
+        await self.bucket.acquire()
+        try:
+            await channel.send(random.choice(MESSAGE_TEMPLATES).format(change_note=change_note))
+        except discord.Forbidden:
+            return await self._record(version, guild_id, 'forbidden')
+        except Exception as e:
+            logger.error(f"Error sending announcement to guild {guild_id}: {e}")
+            await self.db.release_guild_announcement(version, guild_id)
+            return None
+        logger.debug(construct_log(f'Sent version announcement to guild {guild_id}'))
+        return await self._record(version, guild_id, 'sent')
+
+    async def _record(self, version: str, guild_id: int, status: str) -> str:
+        await self.db.record_guild_announcement(version, guild_id, status)
+        return status
@@ -1,12 +1,11 @@
-import time
 import logging
 from typing import Dict, Optional, Callable
-from langchain.tools import tool
 
 import discord
 
 from .utils import resolve_link, validate_url, join_voice_channel
 from .audio import YoutubeDLAudioSource
+from .stats import WEEKDAYS, busiest_slots, format_listening_time
 
 logger = logging.getLogger(__name__)
 
@@ -86,7 +85,7 @@ async def pause_logic(
     voice_client = guild.voice_client
     if voice_client and voice_client.is_playing():
         voice_client.pause()
-        state.set_pause_start_time(guild_id, time.time())
+        state.mark_player_dirty(guild_id)
         await interaction.followup.send(embed=discord.Embed(description="Đã tạm dừng"))
     else:
         await interaction.followup.send(embed=discord.Embed(description="Có đang hát đéo đâu mà pause?"))
@@ -104,16 +103,18 @@ async def resume_logic(
     voice_client = guild.voice_client
     if voice_client and voice_client.is_paused():
         voice_client.resume()
-        pause_start = state.get_pause_start_time(guild_id)
-        if pause_start:
-            paused_duration = time.time() - pause_start
-            total_paused = state.get_total_paused_time(guild_id)
-            state.set_total_paused_time(guild_id, total_paused + paused_duration)
-            state.set_pause_start_time(guild_id, None)
+        state.mark_player_dirty(guild_id)
         await interaction.followup.send(embed=discord.Embed(description="Đã tiếp tục"))
     else:
         await interaction.followup.send(embed=discord.Embed(description="Có đang hát đéo đâu mà resume?"))
 
+def tag_requester(songs, interaction):
+    user = getattr(interaction, 'user', None)
+    if not user:
+        return
+    for song in songs:
+        song.data.setdefault('requester_id', user.id)
+
 async def resolve_link_for_guild(
     voice_id: int,
     link: str,
@@ -121,7 +122,7 @@ async def resolve_link_for_guild(
     state,
     n: int = 1
 ):
-    return await resolve_link(link, loop, state, voice_id, n)
+    return await resolve_link(link, loop, n)
 
 async def play_logic(
     interaction: discord.Interaction,
@@ -179,51 +180,58 @@ async def play_logic(
         songs = await resolve_link_func(guild.id, url, n)
     
     guild_id = guild.id
-    state.clear_idle_start_time(guild_id)
     
-    songs_count = len(songs)
-    voice_client = guild.voice_client
-    current_queue_len = len(queue)
-    is_playing = voice_client and voice_client.is_playing()
-    
-    if current_queue_len - songs_count + 1 if is_playing else 0 > 0:
-        if songs_count == 1:
-            song_title = songs[0].data['title']
-            await interaction.followup.send(embed=discord.Embed(description=f"Đã thêm **{song_title}**"))
-            result = f"Added {song_title} to queue"
-        else:
-            tracks_list = "\n".join([f"{i+1}. {song.data['title']}" for i, song in enumerate(songs)])
-            embed = discord.Embed(
-                title=f"Đã thêm {songs_count} bài hát vào hàng chờ",
-                description=tracks_list
-            )
-            await interaction.followup.send(embed=embed)
-            song_titles = ", ".join([song.data['title'] for song in songs[:3]])
-            if songs_count > 3:
-                song_titles += f" and {songs_count - 3} more"
-            result = f"Added {songs_count} songs to queue: {song_titles}"
-        menu, embed = await construct_queue_menu_func(interaction)
-        if menu:
-            await interaction.followup.send(embed=embed, view=menu)
-    else:
-        if songs_count == 1:
-            result = f"Playing {songs[0].data['title']}"
+    async def enqueue_and_play():
+        state.clear_idle_start_time(guild_id)
+        queue = state.get_queue(guild_id)
+        tag_requester(songs, interaction)
+        queue.extend(songs)
+    
+        songs_count = len(songs)
+        voice_client = guild.voice_client
+        current_queue_len = len(queue)
+        is_playing = voice_client and voice_client.is_playing()
+    
+        if current_queue_len - songs_count + 1 if is_playing else 0 > 0:
+            if songs_count == 1:
+                song_title = songs[0].data['title']
+                await interaction.followup.send(embed=discord.Embed(description=f"Đã thêm **{song_title}**"))
+                result = f"Added {song_title} to queue"
+            else:
+                tracks_list = "\n".join([f"{i+1}. {song.data['title']}" for i, song in enumerate(songs)])
+                embed = discord.Embed(
+                    title=f"Đã thêm {songs_count} bài hát vào hàng chờ",
+                    description=tracks_list
+                )
+                await interaction.followup.send(embed=embed)
+                song_titles = ", ".join([song.data['title'] for song in songs[:3]])
+                if songs_count > 3:
+                    song_titles += f" and {songs_count - 3} more"
+                result = f"Added {songs_count} songs to queue: {song_titles}"
+            menu, embed = await construct_queue_menu_func(interaction)
+            if menu:
+                await interaction.followup.send(embed=embed, view=menu)
         else:
-            song_titles = ", ".join([song.data['title'] for song in songs[:3]])
-            if songs_count > 3:
-                song_titles += f" and {songs_count - 3} more"
-            result = f"Playing {songs_count} songs: {song_titles}"
+            if songs_count == 1:
+                result = f"Playing {songs[0].data['title']}"
+            else:
+                song_titles = ", ".join([song.data['title'] for song in songs[:3]])
+                if songs_count > 3:
+                    song_titles += f" and {songs_count - 3} more"
+                result = f"Playing {songs_count} songs: {song_titles}"
 
-    if is_playing:
-        return result
-    
-    try:
-        await play_next_func(interaction)
-        return result
-    except Exception as e:
-        logger.error(f"Error in play_next: {e}")
-        await interaction.followup.send(embed=discord.Embed(description="Lỗi đ gì ý???"))
-        return f"Error: Failed to start playback - {str(e)}"
+        if is_playing:
+            return result
+    
+        try:
+            await play_next_func(interaction)
+            return result
+        except Exception as e:
+            logger.error(f"Error in play_next: {e}")
+            await interaction.followup.send(embed=discord.Embed(description="Lỗi đ gì ý???"))
+            return f"Error: Failed to start playback - {str(e)}"
+    
+    return await state.actors.run(guild_id, enqueue_and_play)
 
 async def queue_logic(
     interaction: discord.Interaction,
@@ -287,14 +295,7 @@ async def player_logic(
         return
 
     embed = await construct_player_embed_func(interaction)
-    view = player_view_factory(interaction)
-    
-    for item in view.children:
-        if isinstance(item, discord.ui.Button) and item.emoji in ['⏸️', '▶️']:
-            if voice_client.is_paused():
-                item.emoji = '▶️'
-            else:
-                item.emoji = '⏸️'
+    view = player_view_factory(voice_client.is_paused())
 
     message = await interaction.followup.send(embed=embed, view=view)
     state.set_player_message(guild.id, message, interaction)
@@ -387,7 +388,8 @@ async def random_logic(
     db,
     resolve_link_func: Callable,
     construct_queue_menu_func: Callable,
-    play_next_func: Callable
+    play_next_func: Callable,
+    weighting: str = 'uniform'
 ):
     guild = interaction.guild
     if not guild:
@@ -406,7 +408,7 @@ async def random_logic(
         number_of_urls = 10
     
     guild_id = guild.id
-    random_urls = await db.get_random_urls_from_history(guild_id, number_of_urls)
+    random_urls = await db.get_random_tracks(guild_id, number_of_urls, weighting)
     
     if not random_urls:
         await interaction.followup.send(embed=discord.Embed(description="Không có lịch sử phát nhạc trong server này"))
@@ -431,32 +433,127 @@ async def random_logic(
         await interaction.followup.send(embed=discord.Embed(description="Không thể tải bài hát từ lịch sử"))
         return
     
-    state.clear_idle_start_time(guild_id)
+    async def enqueue_and_play():
+        state.clear_idle_start_time(guild_id)
+    
+        songs_count = len(songs)
+        voice_client = guild.voice_client
+        queue = state.get_queue(guild_id)
+        tag_requester(songs, interaction)
+        queue.extend(songs)
+        current_queue_len = len(queue)
+        if current_queue_len - songs_count + 1 if voice_client and voice_client.is_playing() else 0 > 0:
+            if songs_count == 1:
+                await interaction.followup.send(embed=discord.Embed(description=f"Đã thêm **{songs[0].data['title']}** từ lịch sử"))
+            else:
+                tracks_list = "\n".join([f"{i+1}. {song.data['title']}" for i, song in enumerate(songs)])
+                embed = discord.Embed(
+                    title=f"Đã thêm {songs_count} bài hát từ lịch sử vào hàng chờ",
+                    description=tracks_list
+                )
+                await interaction.followup.send(embed=embed)
+            menu, embed = await construct_queue_menu_func(interaction)
+            if menu:
+                await interaction.followup.send(embed=embed, view=menu)
+
+        if voice_client and voice_client.is_playing():
+            return
     
-    songs_count = len(songs)
-    voice_client = guild.voice_client
-    queue = state.get_queue(guild_id)
-    current_queue_len = len(queue)
-    if current_queue_len - songs_count + 1 if voice_client and voice_client.is_playing() else 0 > 0:
-        if songs_count == 1:
-            await interaction.followup.send(embed=discord.Embed(description=f"Đã thêm **{songs[0].data['title']}** từ lịch sử"))
-        else:
-            tracks_list = "\n".join([f"{i+1}. {song.data['title']}" for i, song in enumerate(songs)])
-            embed = discord.Embed(
-                title=f"Đã thêm {songs_count} bài hát từ lịch sử vào hàng chờ",
-                description=tracks_list
-            )
-            await interaction.followup.send(embed=embed)
-        menu, embed = await construct_queue_menu_func(interaction)
-        if menu:
-            await interaction.followup.send(embed=embed, view=menu)
+        try:
+            await play_next_func(interaction)
+        except Exception as e:
+            logger.error(f"Error in play_next: {e}")
+            await interaction.followup.send(embed=discord.Embed(description="Lỗi đ gì ý???"))
+    
+    await state.actors.run(guild_id, enqueue_and_play)
 
-    if voice_client and voice_client.is_playing():
+async def top_logic(
+    interaction: discord.Interaction,
+    db,
+    cache,
+    member: Optional[discord.Member] = None,
+    days: int = 0
+):
+    if not db.pool:
+        await interaction.followup.send(embed=discord.Embed(description="Database không khả dụng. Vui lòng thử lại sau."))
         return
     
-    try:
-        await play_next_func(interaction)
-    except Exception as e:
-        logger.error(f"Error in play_next: {e}")
-        await interaction.followup.send(embed=discord.Embed(description="Lỗi đ gì ý???"))
+    if member and days:
+        # Daily rollups are per guild and track only, so a time window is only available for the whole server.
+        await interaction.followup.send(embed=discord.Embed(description="Chỉ xem được theo khoảng thời gian cho cả server"))
+        return
+    
+    guild_id = interaction.guild.id
+    user_id = member.id if member else None
+    key = ('top', guild_id, user_id, days)
+    tracks = cache.get(key)
+    if tracks is None:
+        tracks = await db.get_top_tracks(guild_id, user_id, days)
+        cache.set(key, tracks)
+    
+    if not tracks:
+        await interaction.followup.send(embed=discord.Embed(description="Chưa có lịch sử phát nhạc"))
+        return
+    
+    if member:
+        title = f"🏆 Bài hát {member.display_name} nghe nhiều nhất"
+    elif days:
+        title = f"🏆 Bài hát được nghe nhiều nhất server trong {days} ngày qua"
+    else:
+        title = "🏆 Bài hát được nghe nhiều nhất server"
+    embed = discord.Embed(title=title)
+    embed.description = "\n".join([
+        f"{i+1}. [{track.get('title') or 'Unknown'}]({track['url']}) - {track['play_count']} lượt"
+        for i, track in enumerate(tracks)
+    ])
+    if days:
+        embed.set_footer(text="Tính đến hết ngày hôm qua (UTC)")
+    await interaction.followup.send(embed=embed)
 
+async def stats_logic(
+    interaction: discord.Interaction,
+    db,
+    cache,
+    member: Optional[discord.Member] = None
+):
+    if not db.pool:
+        await interaction.followup.send(embed=discord.Embed(description="Database không khả dụng. Vui lòng thử lại sau."))
+        return
+    
+    guild_id = interaction.guild.id
+    user_id = member.id if member else None
+    key = ('stats', guild_id, user_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = await db.get_listening_stats(guild_id, user_id)
+        if stats is None:
+            await interaction.followup.send(embed=discord.Embed(description="Không thể lấy thống kê. Vui lòng thử lại sau."))
+            return
+        cache.set(key, stats)
+    
+    if not stats['plays']:
+        await interaction.followup.send(embed=discord.Embed(description="Chưa có lịch sử phát nhạc"))
+        return
+    
+    embed = discord.Embed(title=f"📊 Thống kê của {member.display_name}" if member else "📊 Thống kê server")
+    embed.add_field(name="Lượt phát", value=str(stats['plays']))
+    embed.add_field(name="Thời gian nghe", value=format_listening_time(stats['seconds']))
+    
+    if stats.get('listeners'):
+        embed.add_field(
+            name="Nghe nhiều nhất",
+            value="\n".join([
+                f"{i+1}. <@{row['user_id']}> - {format_listening_time(row['seconds'])}"
+                for i, row in enumerate(stats['listeners'])
+            ]),
+            inline=False
+        )
+    
+    slots = busiest_slots(stats.get('hours', []))
+    if slots:
+        embed.add_field(
+            name="Khung giờ sôi động",
+            value="\n".join([f"{WEEKDAYS[dow]}, {hour:02d}:00 - {plays} lượt" for dow, hour, plays in slots]),
+            inline=False
+        )
+    await interaction.followup.send(embed=embed)
@@ -0,0 +1,109 @@
+import logging
+import re
+import time
+from pathlib import Path
+from typing import List, NamedTuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+NO_TRANSACTION_MARKER = '-- migrate: no-transaction'
+DOLLAR_QUOTE = re.compile(r'\$\w*\$')
+CONCURRENT_INDEX = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self) -> bool:
+        return NO_TRANSACTION_MARKER not in self.sql
+
+    def statements(self) -> List[str]:
+        """Split on semicolons, except inside dollar-quoted bodies such as DO blocks and procedures."""
+        sql = '\n'.join(line for line in self.sql.splitlines() if not line.strip().startswith('--'))
+        statements, start, pos = [], 0, 0
+        while pos < len(sql):
+            quote = DOLLAR_QUOTE.match(sql, pos)
+            if quote:
+                end = sql.find(quote.group(), quote.end())
+                pos = len(sql) if end == -1 else end + len(quote.group())
+                continue
+            if sql[pos] == ';':
+                statements.append(sql[start:pos])
+                start = pos + 1
+            pos += 1
+        statements.append(sql[start:])
+        return [statement.strip() for statement in statements if statement.strip()]
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob('*.sql')):
+        version, _, name = path.stem.partition('_')
+        migrations.append(Migration(int(version), name, path.read_text(encoding='utf-8')))
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+async def current_version(conn: asyncpg.Connection) -> int:
+    if not await conn.fetchval("SELECT to_regclass('schema_migrations') IS NOT NULL"):
+        return 0
+    return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+
+async def apply_migrations(conn: asyncpg.Connection, lock_key: int):
+    """Bring the schema up to date; a no-op costing one query when it already is."""
+    migrations = load_migrations()
+    latest = migrations[-1].version if migrations else 0
+    if await current_version(conn) >= latest:
+        return
+
+    # Session-level lock: concurrent index builds cannot run inside a transaction.
+    await conn.execute("SELECT pg_advisory_lock($1)", lock_key)
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration_ms DOUBLE PRECISION
+            )
+        """)
+        applied = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+        for migration in migrations:
+            if migration.version not in applied:
+                await _apply(conn, migration)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", lock_key)
+
+async def _apply(conn: asyncpg.Connection, migration: Migration):
+    started = time.perf_counter()
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await _record(conn, migration, started)
+    else:
+        for statement in migration.statements():
+            await _drop_invalid_index(conn, statement)
+            await conn.execute(statement)
+        await _record(conn, migration, started)
+    logger.info(f"Applied migration {migration.version:04d}_{migration.name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+async def _drop_invalid_index(conn: asyncpg.Connection, statement: str):
+    # An interrupted concurrent build leaves an INVALID index behind that IF NOT EXISTS would silently keep.
+    match = CONCURRENT_INDEX.search(statement)
+    if not match:
+        return
+    valid = await conn.fetchval("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)", match.group(1))
+    if valid is False:
+        logger.warning(f"Dropping invalid index {match.group(1)} before rebuilding it")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+async def _record(conn: asyncpg.Connection, migration: Migration, started: float):
+    await conn.execute("""
+        INSERT INTO schema_migrations (version, name, duration_ms)
+        VALUES ($1, $2, $3)
+    """, migration.version, migration.name, (time.perf_counter() - started) * 1000)
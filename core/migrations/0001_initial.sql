@@ -0,0 +1,70 @@
+-- Baseline schema. Every statement is idempotent so databases created by the old
+-- create_tables() adopt it without changes.
+
+CREATE TABLE IF NOT EXISTS playlists (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, url)
+);
+
+CREATE TABLE IF NOT EXISTS versions (
+    id SERIAL PRIMARY KEY,
+    version TEXT NOT NULL,
+    release_note TEXT NOT NULL,
+    announced BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS guilds (
+    id SERIAL PRIMARY KEY,
+    guild_id BIGINT NOT NULL UNIQUE,
+    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS play_log (
+    id SERIAL PRIMARY KEY,
+    guild_id BIGINT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS chat_history (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    guild_id BIGINT NOT NULL,
+    channel_id BIGINT,
+    user_message TEXT NOT NULL,
+    agent_response TEXT,
+    message_embedding TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS channel_id BIGINT;
+ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS message_embedding TEXT;
+
+CREATE TABLE IF NOT EXISTS guild_sessions (
+    guild_id BIGINT PRIMARY KEY,
+    voice_channel_id BIGINT NOT NULL,
+    text_channel_id BIGINT,
+    current_track TEXT,
+    position DOUBLE PRECISION DEFAULT 0,
+    queue TEXT NOT NULL DEFAULT '[]',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS version_announcements (
+    version TEXT NOT NULL,
+    guild_id BIGINT NOT NULL,
+    status TEXT NOT NULL,
+    delivered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (version, guild_id)
+);
+
+CREATE TABLE IF NOT EXISTS bot_settings (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- Built concurrently so applying this to a live database does not block writes.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_id ON playlists(user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_guild_id ON guilds(guild_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_play_log_guild_id ON play_log(guild_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_play_log_played_at ON play_log(played_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_user_id ON chat_history(user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_guild_id ON chat_history(guild_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_created_at ON chat_history(created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_channel_created ON chat_history(channel_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_guild_channel ON chat_history(guild_id, channel_id);
@@ -0,0 +1,25 @@
+-- Embeddings move from JSON text to packed little-endian float32. Rows written before this
+-- keep message_embedding until they age out of the retrieval window.
+ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS embedding BYTEA;
+
+-- pgvector is optional: when the extension can be installed, embeddings are mirrored into a
+-- vector column and ranked in the database. The column has no fixed dimension (it follows the
+-- embedding model), so there is no ANN index; lookups are bounded by the (channel_id, created_at)
+-- index instead, which keeps the exact scan to one channel's retrieval window.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'vector') THEN
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS vector;
+        EXCEPTION WHEN insufficient_privilege THEN
+            RAISE NOTICE 'pgvector is available but this role cannot install it';
+        END;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'vector') THEN
+        ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS embedding_vec vector;
+        UPDATE chat_history
+        SET embedding_vec = message_embedding::vector
+        WHERE message_embedding IS NOT NULL AND embedding_vec IS NULL;
+    END IF;
+END $$;
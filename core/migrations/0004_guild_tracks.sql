@@ -0,0 +1,39 @@
+-- One row per unique track per guild, maintained alongside play_log inserts. Each guild's tracks
+-- get dense slot numbers 0..track_count-1, so a uniform random pick is a primary-key lookup on a
+-- random slot instead of a DISTINCT over the whole log.
+
+CREATE TABLE IF NOT EXISTS guild_tracks (
+    guild_id BIGINT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    play_count INTEGER NOT NULL DEFAULT 1,
+    first_played_at TIMESTAMP NOT NULL,
+    last_played_at TIMESTAMP NOT NULL,
+    slot INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, url),
+    UNIQUE (guild_id, slot)
+);
+
+CREATE TABLE IF NOT EXISTS guild_track_counts (
+    guild_id BIGINT PRIMARY KEY,
+    track_count INTEGER NOT NULL
+);
+
+INSERT INTO guild_tracks (guild_id, url, title, play_count, first_played_at, last_played_at, slot)
+SELECT
+    guild_id,
+    url,
+    (ARRAY_AGG(title ORDER BY played_at DESC) FILTER (WHERE title IS NOT NULL))[1],
+    COUNT(*),
+    MIN(played_at),
+    MAX(played_at),
+    ROW_NUMBER() OVER (PARTITION BY guild_id ORDER BY MIN(played_at), url) - 1
+FROM play_log
+GROUP BY guild_id, url
+ON CONFLICT DO NOTHING;
+
+INSERT INTO guild_track_counts (guild_id, track_count)
+SELECT guild_id, MAX(slot) + 1
+FROM guild_tracks
+GROUP BY guild_id
+ON CONFLICT (guild_id) DO UPDATE SET track_count = GREATEST(guild_track_counts.track_count, EXCLUDED.track_count);
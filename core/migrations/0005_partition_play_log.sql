@@ -0,0 +1,134 @@
+-- migrate: no-transaction
+-- play_log becomes a table partitioned by month on played_at. After this the maintenance job creates
+-- partitions ahead of time, rolls finished days up into play_log_daily and drops raw partitions past
+-- the retention window.
+--
+-- The partitioned table is built next to the old one and filled in batches, each committed on its
+-- own, while the old table keeps taking inserts. Only the final catch-up and rename run under an
+-- exclusive lock. Every step checks whether the swap already happened, so an interrupted run can be
+-- retried from the top.
+
+DO $$
+DECLARE
+    month_start DATE;
+    last_month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'play_log'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    CREATE TABLE IF NOT EXISTS play_log_partitioned (
+        id BIGSERIAL,
+        guild_id BIGINT NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT,
+        played_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, played_at)
+    ) PARTITION BY RANGE (played_at);
+
+    -- Catches rows outside every monthly partition so inserts never fail; it stays empty while the
+    -- maintenance job keeps partitions created ahead of the current month.
+    CREATE TABLE IF NOT EXISTS play_log_default PARTITION OF play_log_partitioned DEFAULT;
+
+    SELECT COALESCE(DATE_TRUNC('month', MIN(played_at)), DATE_TRUNC('month', NOW() AT TIME ZONE 'UTC'))::date
+    INTO month_start
+    FROM play_log;
+    last_month := (DATE_TRUNC('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '1 month')::date;
+
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF play_log_partitioned FOR VALUES FROM (%L) TO (%L)',
+            'play_log_p' || to_char(month_start, 'YYYYMM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::date
+        );
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+
+    -- The old table still owns idx_play_log_played_at; the new index takes that name after the swap.
+    CREATE INDEX IF NOT EXISTS idx_play_log_guild_played_at ON play_log_partitioned (guild_id, played_at);
+    CREATE INDEX IF NOT EXISTS idx_play_log_partitioned_played_at ON play_log_partitioned (played_at);
+END $$;
+
+CREATE OR REPLACE PROCEDURE copy_play_log_batches(batch_size INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    last_id BIGINT;
+    copied BIGINT;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'play_log'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    LOOP
+        SELECT COALESCE(MAX(id), 0) INTO last_id FROM play_log_partitioned;
+        INSERT INTO play_log_partitioned (id, guild_id, url, title, played_at)
+        SELECT id, guild_id, url, title, COALESCE(played_at, CURRENT_TIMESTAMP)
+        FROM play_log
+        WHERE id > last_id
+        ORDER BY id
+        LIMIT batch_size;
+        GET DIAGNOSTICS copied = ROW_COUNT;
+        COMMIT;
+        EXIT WHEN copied < batch_size;
+    END LOOP;
+END $$;
+
+CALL copy_play_log_batches(50000);
+
+DROP PROCEDURE copy_play_log_batches(INTEGER);
+
+DO $$
+DECLARE
+    last_id BIGINT;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'play_log'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    LOCK TABLE play_log IN ACCESS EXCLUSIVE MODE;
+
+    -- Rows inserted since the last batch, plus any that committed out of id order behind it.
+    SELECT COALESCE(MAX(id), 0) INTO last_id FROM play_log_partitioned;
+    INSERT INTO play_log_partitioned (id, guild_id, url, title, played_at)
+    SELECT id, guild_id, url, title, COALESCE(played_at, CURRENT_TIMESTAMP)
+    FROM play_log legacy
+    WHERE legacy.id > last_id - 10000
+      AND NOT EXISTS (SELECT 1 FROM play_log_partitioned copied WHERE copied.id = legacy.id);
+
+    PERFORM setval(
+        pg_get_serial_sequence('play_log_partitioned', 'id'),
+        GREATEST((SELECT MAX(id) FROM play_log_partitioned), 1)
+    );
+
+    ALTER TABLE play_log RENAME TO play_log_legacy;
+    ALTER TABLE play_log_partitioned RENAME TO play_log;
+END $$;
+
+DROP TABLE IF EXISTS play_log_legacy;
+
+DO $$
+BEGIN
+    IF to_regclass('play_log_partitioned_id_seq') IS NOT NULL THEN
+        ALTER SEQUENCE play_log_partitioned_id_seq RENAME TO play_log_id_seq;
+    END IF;
+    IF to_regclass('play_log_partitioned_pkey') IS NOT NULL THEN
+        ALTER TABLE play_log RENAME CONSTRAINT play_log_partitioned_pkey TO play_log_pkey;
+    END IF;
+    IF to_regclass('idx_play_log_partitioned_played_at') IS NOT NULL THEN
+        ALTER INDEX idx_play_log_partitioned_played_at RENAME TO idx_play_log_played_at;
+    END IF;
+END $$;
+
+-- Per-day play counts that outlive the raw partitions; /top reads them for its time windows.
+CREATE TABLE IF NOT EXISTS play_log_daily (
+    day DATE NOT NULL,
+    guild_id BIGINT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    plays INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, day, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_play_log_daily_day ON play_log_daily (day);
@@ -0,0 +1,60 @@
+-- Aggregates behind /top and /stats, updated in the same transaction as each play_log batch so the
+-- commands read a handful of rows instead of scanning the log. Per-guild track counts already live
+-- in guild_tracks.play_count.
+
+ALTER TABLE play_log ADD COLUMN IF NOT EXISTS requester_id BIGINT;
+ALTER TABLE play_log ADD COLUMN IF NOT EXISTS duration_seconds INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_guild_tracks_play_count ON guild_tracks (guild_id, play_count DESC);
+
+CREATE TABLE IF NOT EXISTS user_tracks (
+    guild_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    play_count INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (guild_id, user_id, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_tracks_play_count ON user_tracks (guild_id, user_id, play_count DESC);
+
+-- user_id 0 holds the guild-wide totals, including plays nobody requested (restored sessions, old rows).
+CREATE TABLE IF NOT EXISTS listening_totals (
+    guild_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    plays BIGINT NOT NULL DEFAULT 0,
+    seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+
+-- Plays per UTC day of week (0 = Sunday) and hour; at most 168 rows per guild.
+CREATE TABLE IF NOT EXISTS listening_hours (
+    guild_id BIGINT NOT NULL,
+    dow SMALLINT NOT NULL,
+    hour SMALLINT NOT NULL,
+    plays BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, dow, hour)
+);
+
+-- Older plays carry no requester or duration, so only guild-wide play counts can be backfilled.
+-- Raw rows past retention survive only as daily rollups, which have no hour of day.
+INSERT INTO listening_totals (guild_id, user_id, plays, seconds)
+SELECT guild_id, 0, COALESCE(SUM(plays), 0), 0
+FROM (
+    SELECT guild_id, COUNT(*) AS plays
+    FROM play_log
+    GROUP BY guild_id
+    UNION ALL
+    SELECT guild_id, SUM(plays)
+    FROM play_log_daily
+    WHERE day < (SELECT COALESCE(MIN(played_at)::date, CURRENT_DATE) FROM play_log)
+    GROUP BY guild_id
+) counts
+GROUP BY guild_id
+ON CONFLICT (guild_id, user_id) DO NOTHING;
+
+INSERT INTO listening_hours (guild_id, dow, hour, plays)
+SELECT guild_id, EXTRACT(DOW FROM played_at)::smallint, EXTRACT(HOUR FROM played_at)::smallint, COUNT(*)
+FROM play_log
+GROUP BY 1, 2, 3
+ON CONFLICT (guild_id, dow, hour) DO NOTHING;
@@ -0,0 +1,10 @@
+-- Ids of play log spool batches already written, recorded in the same transaction as their rows.
+-- A replay interrupted after its commit but before the spool file was removed re-sends the whole
+-- file; batches found here are skipped so the listening aggregates are not counted twice.
+
+CREATE TABLE IF NOT EXISTS applied_spool_batches (
+    batch_id TEXT PRIMARY KEY,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_applied_spool_batches_applied_at ON applied_spool_batches (applied_at);
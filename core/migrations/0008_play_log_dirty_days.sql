@@ -0,0 +1,7 @@
+-- Days that received play_log rows after they may already have been rolled up (spool replays, or
+-- a flush that crosses midnight). The maintenance job recomputes their play_log_daily rows and
+-- clears them here, however far behind the rollup watermark they are.
+
+CREATE TABLE IF NOT EXISTS play_log_dirty_days (
+    day DATE PRIMARY KEY
+);
@@ -0,0 +1,47 @@
+import time
+from typing import Dict
+
+class TrackHandoffTracker:
+    def __init__(self):
+        self._seq: Dict[int, int] = {}
+        self._ended_at: Dict[int, float] = {}
+        self.handoffs = 0
+        self.stale = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def begin(self, guild_id: int) -> int:
+        seq = self._seq.get(guild_id, 0) + 1
+        self._seq[guild_id] = seq
+        ended_at = self._ended_at.pop(guild_id, None)
+        if ended_at is not None:
+            latency = time.perf_counter() - ended_at
+            self.handoffs += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        return seq
+
+    def is_current(self, guild_id: int, seq: int) -> bool:
+        return self._seq.get(guild_id) == seq
+
+    def track_ended(self, guild_id: int, ended_at: float):
+        self._ended_at[guild_id] = ended_at
+
+    def settle(self, guild_id: int):
+        self._ended_at.pop(guild_id, None)
+
+    def record_stale(self):
+        self.stale += 1
+
+    def record_failure(self):
+        self.failed += 1
+
+    def stats(self) -> Dict:
+        return {
+            'handoffs': self.handoffs,
+            'stale': self.stale,
+            'failed': self.failed,
+            'avg_latency': self.total_latency / self.handoffs if self.handoffs else 0.0,
+            'max_latency': self.max_latency
+        }
@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from .utils import construct_log
+
+logger = logging.getLogger(__name__)
+
+PLAY_LOG_BATCH_SIZE = 50
+PLAY_LOG_SPOOL_PATH = os.getenv('PLAY_LOG_SPOOL_PATH', 'play_log.spool.jsonl')
+
+def process_spool_path(base: str = PLAY_LOG_SPOOL_PATH) -> str:
+    # Shard processes started by launcher.py share a working directory, so each spools to its own file.
+    shard_ids = os.getenv('SHARD_IDS', '').strip()
+    root, ext = os.path.splitext(base)
+    return f"{root}.{shard_ids.replace(',', '-') if shard_ids else 'main'}{ext}"
+
+def spool_files(base: str = PLAY_LOG_SPOOL_PATH) -> List[str]:
+    root, ext = os.path.splitext(base)
+    return sorted(glob.glob(f"{glob.escape(root)}*{ext}"))
+
+class PlayLogWriter:
+    """Buffers play_log rows and writes them in batches, spooling to disk while the database is unavailable."""
+
+    def __init__(self, db, spool_path: Optional[str] = None, batch_size: int = PLAY_LOG_BATCH_SIZE):
+        self.db = db
+        self.spool_path = spool_path or process_spool_path()
+        self.batch_size = batch_size
+        self._buffer: List[tuple] = []
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.spooled = self._count_spooled()
+        self.flushed = 0
+        self.flushes = 0
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    def record(
+        self,
+        guild_id: int,
+        url: str,
+        title: Optional[str] = None,
+        requester_id: Optional[int] = None,
+        duration_seconds: Optional[int] = None
+    ):
+        played_at = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        self._buffer.append((guild_id, url, title, played_at, requester_id, duration_seconds))
+        if len(self._buffer) >= self.batch_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            rows, self._buffer = self._buffer, []
+            if not rows and not self.spooled:
+                return
+
+            started = time.perf_counter()
+            if self.spooled and self.db.pool:
+                await self._replay_spool()
+
+            if rows:
+                if self.spooled or not self.db.pool or not await self.db.log_played_urls(rows):
+                    await asyncio.to_thread(self._append_spool, rows)
+                    self.spooled += len(rows)
+                    logger.warning(construct_log(f"Spooled {len(rows)} play log row(s) to {self.spool_path}"))
+                else:
+                    self.flushed += len(rows)
+
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.total_flush_time += elapsed
+            self.max_flush_time = max(self.max_flush_time, elapsed)
+
+    async def _replay_spool(self):
+        replayed = await self._replay_file(self.spool_path)
+        if replayed is None:
+            return
+        self.flushed += replayed
+        self.spooled = 0
+        if replayed:
+            logger.info(construct_log(f"Replayed {replayed} spooled play log row(s)"))
+
+    async def replay_orphaned_spools(self):
+        """Replay spool files no running process owns, e.g. after the shard layout changed."""
+        own = os.path.abspath(self.spool_path)
+        for path in await asyncio.to_thread(spool_files):
+            if os.path.abspath(path) == own:
+                continue
+            replayed = await self._replay_file(path, blocking=False)
+            if replayed:
+                logger.info(construct_log(f"Replayed {replayed} play log row(s) from orphaned spool {path}"))
+
+    async def _replay_file(self, path: str, blocking: bool = True) -> Optional[int]:
+        # The lock is held until the rows are in the database and the file is gone, so rows appended by
+        # the owner meanwhile go to a fresh file instead of being removed unread.
+        f = await asyncio.to_thread(self._open_locked, path, 'r', blocking)
+        if f is None:
+            return 0
+        try:
+            replayed = 0
+            for batch_id, rows in await asyncio.to_thread(self._read_batches, f):
+                # Batches already applied by an earlier, interrupted replay are skipped by the database.
+                if not await self.db.log_played_urls(rows, batch_id):
+                    return None
+                replayed += len(rows)
+            await asyncio.to_thread(self._remove, path)
+            return replayed
+        finally:
+            f.close()
+
+    def _open_locked(self, path: str, mode: str, blocking: bool = True):
+        """Open path and take an exclusive lock on it; None if it is gone, or busy when not blocking."""
+        while True:
+            try:
+                f = open(path, mode, encoding='utf-8')
+            except FileNotFoundError:
+                return None
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                return None
+            try:
+                current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                return f
+            # Replayed and removed by another process while we waited for the lock.
+            f.close()
+            if mode == 'r':
+                return None
+
+    def _append_spool(self, rows: List[tuple]):
+        batch_id = uuid.uuid4().hex
+        f = self._open_locked(self.spool_path, 'a')
+        try:
+            for guild_id, url, title, played_at, requester_id, duration_seconds in rows:
+                f.write(json.dumps({
+                    'batch': batch_id,
+                    'guild_id': guild_id,
+                    'url': url,
+                    'title': title,
+                    'played_at': played_at.isoformat(),
+                    'requester_id': requester_id,
+                    'duration_seconds': duration_seconds
+                }) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    def _read_batches(self, f) -> List[tuple]:
+        """Group spooled rows into (batch_id, rows) in file order; lines from older spools have no batch id."""
+        batches = []
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            batch_id = entry.get('batch')
+            if not batches or batches[-1][0] != batch_id:
+                batches.append((batch_id, []))
+            batches[-1][1].append((
+                entry['guild_id'],
+                entry['url'],
+                entry.get('title'),
+                datetime.datetime.fromisoformat(entry['played_at']),
+                entry.get('requester_id'),
+                entry.get('duration_seconds')
+            ))
+        return batches
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _count_spooled(self) -> int:
+        try:
+            with open(self.spool_path, encoding='utf-8') as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def stats(self) -> Dict:
+        return {
+            'buffered': len(self._buffer),
+            'spooled': self.spooled,
+            'flushed': self.flushed,
+            'avg_flush': self.total_flush_time / self.flushes if self.flushes else 0.0,
+            'max_flush': self.max_flush_time
+        }
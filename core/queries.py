@@ -0,0 +1,393 @@
+from typing import Dict, List
+
+# Every statement PlaylistDatabase runs, by name. Keeping the SQL text in one place means each
+# statement hits the same entry in asyncpg's per-connection statement cache, so it is parsed and
+# planned once per connection, and lets query timings be reported by name.
+QUERIES: Dict[str, str] = {
+    'get_setting': """
+        SELECT value
+        FROM bot_settings
+        WHERE key = $1
+    """,
+    'set_setting': """
+        INSERT INTO bot_settings (key, value, updated_at)
+        VALUES ($1, $2, CURRENT_TIMESTAMP)
+        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+    """,
+    'notify': """
+        SELECT pg_notify($1, $2)
+    """,
+    'add_song': """
+        INSERT INTO playlists (user_id, url, title)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (user_id, url) DO NOTHING
+    """,
+    'get_playlist': """
+        SELECT id, url, title, added_at
+        FROM playlists
+        WHERE user_id = $1
+        ORDER BY added_at ASC
+    """,
+    'remove_song_by_index': """
+        DELETE FROM playlists
+        WHERE user_id = $1 AND id = (
+            SELECT id FROM playlists
+            WHERE user_id = $1
+            ORDER BY added_at ASC
+            LIMIT 1 OFFSET $2
+        )
+    """,
+    'remove_song_by_match': """
+        DELETE FROM playlists
+        WHERE id = (
+            SELECT id FROM playlists
+            WHERE user_id = $1 AND (url = $2 OR title ILIKE $3)
+            ORDER BY added_at ASC
+            LIMIT 1
+        )
+    """,
+    'get_playlist_urls': """
+        SELECT url
+        FROM playlists
+        WHERE user_id = $1
+        ORDER BY added_at ASC
+    """,
+    'get_latest_version': """
+        SELECT version
+        FROM versions
+        ORDER BY id DESC
+        LIMIT 1
+    """,
+    'add_version': """
+        INSERT INTO versions (version, release_note, announced)
+        VALUES ($1, $2, FALSE)
+    """,
+    'add_guild': """
+        INSERT INTO guilds (guild_id)
+        VALUES ($1)
+        ON CONFLICT (guild_id) DO NOTHING
+    """,
+    'add_guilds': """
+        INSERT INTO guilds (guild_id)
+        SELECT unnest($1::bigint[])
+        ON CONFLICT (guild_id) DO NOTHING
+    """,
+    'get_all_guilds': """
+        SELECT guild_id
+        FROM guilds
+    """,
+    'is_version_announced': """
+        SELECT announced
+        FROM versions
+        WHERE version = $1
+    """,
+    'mark_version_announced': """
+        UPDATE versions
+        SET announced = TRUE
+        WHERE version = $1
+    """,
+    'get_announced_guilds': """
+        SELECT guild_id
+        FROM version_announcements
+        WHERE version = $1
+          AND status <> 'sending'
+    """,
+    'claim_guild_announcement': """
+        INSERT INTO version_announcements (version, guild_id, status, delivered_at)
+        VALUES ($1, $2, 'sending', CURRENT_TIMESTAMP)
+        ON CONFLICT (version, guild_id) DO UPDATE
+        SET delivered_at = CURRENT_TIMESTAMP
+        WHERE version_announcements.status = 'sending'
+          AND version_announcements.delivered_at < CURRENT_TIMESTAMP - make_interval(secs => $3)
+        RETURNING guild_id
+    """,
+    'release_guild_announcement': """
+        DELETE FROM version_announcements
+        WHERE version = $1 AND guild_id = $2 AND status = 'sending'
+    """,
+    'record_guild_announcement': """
+        INSERT INTO version_announcements (version, guild_id, status)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (version, guild_id) DO UPDATE
+        SET status = EXCLUDED.status, delivered_at = CURRENT_TIMESTAMP
+        WHERE version_announcements.status = 'sending'
+    """,
+    'get_version_release_note': """
+        SELECT release_note
+        FROM versions
+        WHERE version = $1
+    """,
+    'log_played_urls': """
+        INSERT INTO play_log (guild_id, url, title, played_at, requester_id, duration_seconds)
+        VALUES ($1, $2, $3, $4, $5, $6)
+    """,
+    'claim_spool_batch': """
+        INSERT INTO applied_spool_batches (batch_id)
+        VALUES ($1)
+        ON CONFLICT (batch_id) DO NOTHING
+        RETURNING batch_id
+    """,
+    'prune_applied_spool_batches': """
+        DELETE FROM applied_spool_batches
+        WHERE applied_at < $1
+    """,
+    'record_guild_track': """
+        WITH existing AS (
+            UPDATE guild_tracks
+            SET play_count = play_count + 1,
+                last_played_at = GREATEST(last_played_at, $4),
+                title = COALESCE($3, title)
+            WHERE guild_id = $1 AND url = $2
+            RETURNING 1
+        ), counter AS (
+            INSERT INTO guild_track_counts (guild_id, track_count)
+            SELECT $1, 1
+            WHERE NOT EXISTS (SELECT 1 FROM existing)
+            ON CONFLICT (guild_id) DO UPDATE SET track_count = guild_track_counts.track_count + 1
+            RETURNING track_count - 1 AS slot
+        )
+        INSERT INTO guild_tracks (guild_id, url, title, play_count, first_played_at, last_played_at, slot)
+        SELECT $1, $2, $3, 1, $4, $4, slot
+        FROM counter
+        ON CONFLICT (guild_id, url) DO UPDATE
+        SET play_count = guild_tracks.play_count + 1,
+            last_played_at = GREATEST(guild_tracks.last_played_at, EXCLUDED.last_played_at)
+    """,
+    'get_guild_track_count': """
+        SELECT track_count
+        FROM guild_track_counts
+        WHERE guild_id = $1
+    """,
+    'get_guild_tracks_by_slot': """
+        SELECT url, title, play_count, last_played_at
+        FROM guild_tracks
+        WHERE guild_id = $1 AND slot = ANY($2::int[])
+    """,
+    'record_user_tracks': """
+        INSERT INTO user_tracks (guild_id, user_id, url, title, play_count)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (guild_id, user_id, url) DO UPDATE
+        SET play_count = user_tracks.play_count + EXCLUDED.play_count,
+            title = COALESCE(EXCLUDED.title, user_tracks.title)
+    """,
+    'record_listening_totals': """
+        INSERT INTO listening_totals (guild_id, user_id, plays, seconds)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (guild_id, user_id) DO UPDATE
+        SET plays = listening_totals.plays + EXCLUDED.plays,
+            seconds = listening_totals.seconds + EXCLUDED.seconds
+    """,
+    'record_listening_hours': """
+        INSERT INTO listening_hours (guild_id, dow, hour, plays)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (guild_id, dow, hour) DO UPDATE
+        SET plays = listening_hours.plays + EXCLUDED.plays
+    """,
+    'get_top_guild_tracks': """
+        SELECT url, title, play_count
+        FROM guild_tracks
+        WHERE guild_id = $1
+        ORDER BY play_count DESC
+        LIMIT $2
+    """,
+    'get_top_guild_tracks_since': """
+        SELECT url, MAX(title) AS title, SUM(plays) AS play_count
+        FROM play_log_daily
+        WHERE guild_id = $1 AND day >= $2
+        GROUP BY url
+        ORDER BY play_count DESC
+        LIMIT $3
+    """,
+    'get_top_user_tracks': """
+        SELECT url, title, play_count
+        FROM user_tracks
+        WHERE guild_id = $1 AND user_id = $2
+        ORDER BY play_count DESC
+        LIMIT $3
+    """,
+    'get_listening_totals': """
+        SELECT plays, seconds
+        FROM listening_totals
+        WHERE guild_id = $1 AND user_id = $2
+    """,
+    'get_top_listeners': """
+        SELECT user_id, plays, seconds
+        FROM listening_totals
+        WHERE guild_id = $1 AND user_id <> 0
+        ORDER BY seconds DESC, plays DESC
+        LIMIT $2
+    """,
+    'get_listening_hours': """
+        SELECT dow, hour, plays
+        FROM listening_hours
+        WHERE guild_id = $1
+    """,
+    'get_play_log_partitions': """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'play_log'::regclass
+    """,
+    'get_oldest_play_day': """
+        SELECT MIN(played_at)::date
+        FROM play_log
+    """,
+    'rollup_play_log_day': """
+        INSERT INTO play_log_daily (day, guild_id, url, title, plays)
+        SELECT $1::date, guild_id, url, MAX(title), COUNT(*)
+        FROM play_log
+        WHERE played_at >= $1::date AND played_at < $1::date + 1
+        GROUP BY guild_id, url
+        ON CONFLICT (guild_id, day, url) DO UPDATE
+        SET plays = EXCLUDED.plays,
+            title = COALESCE(EXCLUDED.title, play_log_daily.title)
+    """,
+    'mark_play_log_day_dirty': """
+        INSERT INTO play_log_dirty_days (day)
+        VALUES ($1)
+        ON CONFLICT (day) DO NOTHING
+    """,
+    'get_dirty_play_log_days': """
+        SELECT day
+        FROM play_log_dirty_days
+        WHERE day < $1
+        ORDER BY day
+    """,
+    'clear_dirty_play_log_day': """
+        DELETE FROM play_log_dirty_days
+        WHERE day = $1
+    """,
+    'get_play_log_default_months': """
+        SELECT DISTINCT DATE_TRUNC('month', played_at)::date AS month
+        FROM play_log_default
+    """,
+    'fold_play_log_default': """
+        WITH moved AS (
+            DELETE FROM play_log_default
+            WHERE played_at < $1::date
+            RETURNING guild_id, url, title, played_at
+        )
+        INSERT INTO play_log_daily (day, guild_id, url, title, plays)
+        SELECT played_at::date, guild_id, url, MAX(title), COUNT(*)
+        FROM moved
+        GROUP BY played_at::date, guild_id, url
+        ON CONFLICT (guild_id, day, url) DO UPDATE
+        SET plays = play_log_daily.plays + EXCLUDED.plays,
+            title = COALESCE(EXCLUDED.title, play_log_daily.title)
+    """,
+    'save_chat_history': """
+        INSERT INTO chat_history (user_id, guild_id, channel_id, user_message, agent_response)
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING id
+    """,
+    'update_chat_history_response': """
+        UPDATE chat_history
+        SET agent_response = $1
+        WHERE id = (
+            SELECT id
+            FROM chat_history
+            WHERE user_id = $2
+              AND guild_id = $3
+              AND agent_response IS NULL
+            ORDER BY created_at DESC
+            LIMIT 1
+        )
+    """,
+    'get_recent_channel_messages': """
+        SELECT id, user_id, guild_id, user_message, agent_response, message_embedding, created_at
+        FROM chat_history
+        WHERE channel_id = $1
+          AND created_at >= NOW() - ($2 || ' hours')::INTERVAL
+        ORDER BY created_at DESC
+        LIMIT $3
+    """,
+    'get_channel_embeddings': """
+        SELECT DISTINCT ON (user_message) user_message, agent_response, embedding, message_embedding
+        FROM chat_history
+        WHERE channel_id = $1
+          AND created_at >= $2
+          AND user_message = ANY($3::text[])
+          AND (embedding IS NOT NULL OR message_embedding IS NOT NULL)
+        ORDER BY user_message, created_at DESC
+    """,
+    'get_similar_messages': """
+        SELECT DISTINCT ON (user_message) user_message, agent_response, 1 - (embedding_vec <=> $3::text::vector) AS similarity
+        FROM chat_history
+        WHERE channel_id = $1
+          AND created_at >= $2
+          AND user_message = ANY($5::text[])
+          AND embedding_vec IS NOT NULL
+          AND vector_dims(embedding_vec) = $4
+        ORDER BY user_message, created_at DESC
+    """,
+    'has_vector_column': """
+        SELECT EXISTS (
+            SELECT 1
+            FROM information_schema.columns
+            WHERE table_name = 'chat_history' AND column_name = 'embedding_vec'
+        )
+    """,
+    'update_message_embedding': """
+        UPDATE chat_history
+        SET embedding = $1, message_embedding = NULL
+        WHERE id = $2
+    """,
+    'update_message_embedding_vec': """
+        UPDATE chat_history
+        SET embedding = $1, embedding_vec = $3::text::vector, message_embedding = NULL
+        WHERE id = $2
+    """,
+    'save_guild_session': """
+        INSERT INTO guild_sessions (guild_id, voice_channel_id, text_channel_id, current_track, position, queue, updated_at)
+        VALUES ($1, $2, $3, $4, $5, $6, CURRENT_TIMESTAMP)
+        ON CONFLICT (guild_id) DO UPDATE
+        SET voice_channel_id = EXCLUDED.voice_channel_id,
+            text_channel_id = EXCLUDED.text_channel_id,
+            current_track = EXCLUDED.current_track,
+            position = EXCLUDED.position,
+            queue = EXCLUDED.queue,
+            updated_at = CURRENT_TIMESTAMP
+    """,
+    'update_guild_session_position': """
+        UPDATE guild_sessions
+        SET position = $2, updated_at = CURRENT_TIMESTAMP
+        WHERE guild_id = $1
+    """,
+    'delete_guild_session': """
+        DELETE FROM guild_sessions
+        WHERE guild_id = $1
+    """,
+    'get_guild_sessions': """
+        SELECT guild_id, voice_channel_id, text_channel_id, current_track, position, queue
+        FROM guild_sessions
+        ORDER BY updated_at DESC
+    """,
+}
+
+class QueryStats:
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.total_time: Dict[str, float] = {}
+        self.max_time: Dict[str, float] = {}
+
+    def record(self, name: str, elapsed: float, failed: bool = False):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.total_time[name] = self.total_time.get(name, 0.0) + elapsed
+        self.max_time[name] = max(self.max_time.get(name, 0.0), elapsed)
+        if failed:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def top(self, limit: int = 5) -> List[Dict]:
+        names = sorted(self.total_time, key=self.total_time.get, reverse=True)[:limit]
+        return [
+            {
+                'name': name,
+                'calls': self.calls[name],
+                'errors': self.errors.get(name, 0),
+                'total': self.total_time[name],
+                'avg': self.total_time[name] / self.calls[name],
+                'max': self.max_time[name]
+            }
+            for name in names
+        ]
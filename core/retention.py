@@ -0,0 +1,104 @@
+import datetime
+import logging
+import os
+import time
+
+from .database import play_log_partition_month
+from .utils import construct_log
+
+logger = logging.getLogger(__name__)
+
+PLAY_LOG_RETENTION_DAYS = int(os.getenv('PLAY_LOG_RETENTION_DAYS', '180'))
+PARTITION_MONTHS_AHEAD = 2
+ROLLUP_WATERMARK = 'play_log_rolled_up_through'
+
+def utc_today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+class PlayLogMaintenance:
+    """Keeps the partitioned play_log healthy: partitions ahead, daily rollups, raw-row retention.
+
+    Days in a month with a partition are rolled up by recomputing them from the raw rows. Rows for a
+    month without one sit in play_log_default and are added to play_log_daily by drop_expired
+    instead, since the rest of that month's raw rows may already be gone.
+    """
+
+    def __init__(self, db, retention_days: int = PLAY_LOG_RETENTION_DAYS):
+        self.db = db
+        self.retention_days = retention_days
+
+    async def run(self):
+        started = time.perf_counter()
+        today = utc_today()
+
+        created = await self.db.ensure_play_log_partitions(today, PARTITION_MONTHS_AHEAD + 1)
+        created += await self.partition_default_rows(today)
+        partitioned = {
+            month for month in map(play_log_partition_month, await self.db.get_play_log_partitions()) if month
+        }
+        rolled_through = await self.rollup(today, partitioned)
+        dropped, folded = await self.drop_expired(today, rolled_through)
+        # Replayed spool batches are remembered for as long as raw rows are kept.
+        await self.db.prune_applied_spool_batches(
+            datetime.datetime.combine(today - datetime.timedelta(days=self.retention_days), datetime.time())
+        )
+
+        logger.info(construct_log(
+            f"play_log maintenance: {len(created)} partition(s) created, rolled up through {rolled_through}, "
+            f"{len(dropped)} partition(s) dropped, {folded} rollup row(s) folded from play_log_default "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
+
+    async def partition_default_rows(self, today: datetime.date) -> list:
+        # Months inside the retention window get a partition, taking their default rows with it.
+        cutoff = month_start(today - datetime.timedelta(days=self.retention_days))
+        created = []
+        for month in sorted(await self.db.get_play_log_default_months()):
+            if month >= cutoff:
+                created += await self.db.ensure_play_log_partitions(month, 1)
+        return created
+
+    async def rollup(self, today: datetime.date, partitioned: set) -> datetime.date:
+        watermark = await self.db.get_setting(ROLLUP_WATERMARK)
+        if watermark:
+            rolled_through = datetime.date.fromisoformat(watermark)
+            day = rolled_through + datetime.timedelta(days=1)
+        else:
+            day = await self.db.get_oldest_play_day() or today
+            rolled_through = day - datetime.timedelta(days=1)
+
+        while day < today:
+            if month_start(day) in partitioned:
+                if not await self.db.rollup_play_log_day(day, ROLLUP_WATERMARK):
+                    break
+            elif not await self.db.set_setting(ROLLUP_WATERMARK, day.isoformat()):
+                break
+            rolled_through = day
+            day += datetime.timedelta(days=1)
+
+        # Days that got rows after they were rolled up, however long ago.
+        for dirty_day in await self.db.get_dirty_play_log_days(min(today, rolled_through + datetime.timedelta(days=1))):
+            if month_start(dirty_day) in partitioned:
+                await self.db.rollup_play_log_day(dirty_day)
+            else:
+                await self.db.clear_dirty_play_log_day(dirty_day)
+        return rolled_through
+
+    async def drop_expired(self, today: datetime.date, rolled_through: datetime.date) -> tuple:
+        # A raw partition may only go once it is past retention *and* every day in it has a rollup.
+        horizon = min(today - datetime.timedelta(days=self.retention_days), rolled_through + datetime.timedelta(days=1))
+        dropped = []
+        for name in await self.db.get_play_log_partitions():
+            month = play_log_partition_month(name)
+            if month is None:
+                continue
+            month_end = (month + datetime.timedelta(days=32)).replace(day=1)
+            if month_end <= horizon and await self.db.drop_play_log_partition(name):
+                dropped.append(name)
+
+        # Default rows older than any partition still kept only ever reach play_log_daily this way.
+        folded = await self.db.fold_play_log_default(month_start(horizon))
+        return dropped, folded
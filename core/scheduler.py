@@ -0,0 +1,102 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List
+
+PLAYER_EDITS_PER_SECOND = 5.0
+PLAYER_EDIT_BURST = 5
+PLAYER_MIN_EDIT_INTERVAL = 2.0
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class PlayerUpdateScheduler:
+    def __init__(
+        self,
+        edits_per_second: float = PLAYER_EDITS_PER_SECOND,
+        burst: int = PLAYER_EDIT_BURST,
+        min_interval: float = PLAYER_MIN_EDIT_INTERVAL
+    ):
+        self.bucket = TokenBucket(edits_per_second, burst)
+        self.min_interval = min_interval
+        self.pending: OrderedDict[int, float] = OrderedDict()
+        self.last_key: Dict[int, Hashable] = {}
+        self.last_edit: Dict[int, float] = {}
+        self.edits = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.deferred = 0
+        self.identical = 0
+
+    def mark_dirty(self, guild_id: int):
+        if guild_id in self.pending:
+            self.coalesced += 1
+        else:
+            self.pending[guild_id] = time.monotonic()
+
+    def observe(self, guild_id: int, key: Hashable):
+        if self.last_key.get(guild_id) != key:
+            self.mark_dirty(guild_id)
+        else:
+            self.skipped += 1
+
+    def due(self) -> List[int]:
+        now = time.monotonic()
+        ready = []
+        guild_ids = list(self.pending.keys())
+        for index, guild_id in enumerate(guild_ids):
+            if now - self.last_edit.get(guild_id, 0.0) < self.min_interval:
+                self.deferred += 1
+                continue
+            if not self.bucket.try_acquire():
+                self.deferred += len(guild_ids) - index
+                break
+            del self.pending[guild_id]
+            ready.append(guild_id)
+        return ready
+
+    def record_edit(self, guild_id: int, key: Hashable):
+        self.last_key[guild_id] = key
+        self.last_edit[guild_id] = time.monotonic()
+        self.pending.pop(guild_id, None)
+        self.edits += 1
+
+    def record_identical(self, guild_id: int, key: Hashable):
+        self.last_key[guild_id] = key
+        self.pending.pop(guild_id, None)
+        self.identical += 1
+
+    def forget(self, guild_id: int):
+        self.pending.pop(guild_id, None)
+        self.last_key.pop(guild_id, None)
+        self.last_edit.pop(guild_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            'pending': len(self.pending),
+            'edits': self.edits,
+            'coalesced': self.coalesced,
+            'skipped': self.skipped,
+            'deferred': self.deferred,
+            'identical': self.identical
+        }
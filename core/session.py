@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import discord
+
+from .audio import PendingTrack
+from .utils import construct_log, get_playback_position, owns_guild
+
+logger = logging.getLogger(__name__)
+
+POSITION_SAVE_INTERVAL = 15.0
+# Queue edits come in bursts (bulk adds, shuffles); the full queue is rewritten at most this often.
+QUEUE_SAVE_INTERVAL = 15.0
+RESTORE_STAGGER = 1.0
+
+def track_descriptor(song) -> Optional[Dict]:
+    data = getattr(song, 'data', None)
+    if not data or not data.get('url'):
+        return None
+    descriptor = {
+        'title': data.get('title', 'Unknown'),
+        'duration': data.get('duration', '00:00'),
+        'url': data['url']
+    }
+    if data.get('requester_id'):
+        descriptor['requester_id'] = data['requester_id']
+    return descriptor
+
+class ChannelInteraction:
+    """Stand-in for an interaction when playback is resumed without a user command."""
+
+    class Followup:
+        def __init__(self, channel):
+            self.channel = channel
+
+        async def send(self, *args, **kwargs):
+            kwargs.pop('ephemeral', None)
+            if not self.channel:
+                raise RuntimeError("No text channel to send to")
+            return await self.channel.send(*args, **kwargs)
+
+    def __init__(self, guild: discord.Guild, channel: Optional[discord.TextChannel]):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.user = None
+        self.followup = ChannelInteraction.Followup(channel)
+
+class SessionStore:
+    def __init__(self, state, db):
+        self.state = state
+        self.db = db
+        self._saved: Dict[int, tuple] = {}
+
+    def _snapshot(self, guild: discord.Guild):
+        voice_client = guild.voice_client
+        if not voice_client or not voice_client.is_connected() or not voice_client.channel:
+            return None
+
+        guild_id = guild.id
+        queue = self.state.get_queue(guild_id)
+        current_track = None
+        if voice_client.is_playing() or voice_client.is_paused():
+            current_track = track_descriptor(voice_client.source)
+
+        if not current_track and len(queue) == 0:
+            return None
+
+        return {
+            'voice_channel_id': voice_client.channel.id,
+            'text_channel_id': self.state.get_text_channel_id(guild_id),
+            'current_track': current_track,
+            'position': get_playback_position(voice_client) if current_track else 0.0,
+            'queue_version': queue.version,
+            'source_id': id(voice_client.source) if current_track else None,
+            'queue': queue
+        }
+
+    async def flush(self, bot):
+        guild_ids = set(self.state.guild_ids()) | set(self._saved.keys())
+        for guild_id in guild_ids:
+            guild = bot.get_guild(guild_id)
+            if not guild:
+                continue
+            try:
+                await self._flush_guild(guild)
+            except Exception as e:
+                logger.error(construct_log(f"Error persisting session for guild {guild_id}: {e}"))
+
+    async def _flush_guild(self, guild: discord.Guild):
+        guild_id = guild.id
+        snapshot = self._snapshot(guild)
+        saved = self._saved.get(guild_id)
+
+        if snapshot is None:
+            if saved is not None:
+                await self.db.delete_guild_session(guild_id)
+                del self._saved[guild_id]
+            return
+
+        signature = (
+            snapshot['voice_channel_id'],
+            snapshot['text_channel_id'],
+            snapshot['current_track']['url'] if snapshot['current_track'] else None,
+            snapshot['source_id']
+        )
+        queue_version = snapshot['queue_version']
+        position = snapshot['position']
+        now = time.monotonic()
+
+        if saved is None or saved[0] != signature or (saved[1] != queue_version and now - saved[3] >= QUEUE_SAVE_INTERVAL):
+            queue = [d for d in (track_descriptor(song) for song in list(snapshot['queue'])) if d]
+            success = await self.db.save_guild_session(
+                guild_id,
+                snapshot['voice_channel_id'],
+                snapshot['text_channel_id'],
+                snapshot['current_track'],
+                position,
+                queue
+            )
+            if success:
+                self._saved[guild_id] = (signature, queue_version, position, now)
+        elif abs(position - saved[2]) >= POSITION_SAVE_INTERVAL:
+            if await self.db.update_guild_session_position(guild_id, position):
+                self._saved[guild_id] = (saved[0], saved[1], position, saved[3])
+
+    async def forget(self, guild_id: int):
+        """Drop a guild the bot no longer plays in, along with its stored session."""
+        if self._saved.pop(guild_id, None) is not None:
+            await self.db.delete_guild_session(guild_id)
+
+    async def restore(self, bot, play_next):
+        sessions = [session for session in await self.db.get_guild_sessions() if owns_guild(bot, session['guild_id'])]
+        if not sessions:
+            return
+        logger.info(f"Restoring {len(sessions)} saved playback session(s)")
+        for session in sessions:
+            guild = bot.get_guild(session['guild_id'])
+            if not guild:
+                continue
+            self._saved[guild.id] = (None, None, session['position'] or 0.0, 0.0)
+            try:
+                await self._restore_session(guild, session, play_next)
+            except Exception as e:
+                logger.error(construct_log(f"Error restoring session for guild {guild.id}: {e}"))
+            await asyncio.sleep(RESTORE_STAGGER)
+
+    async def _restore_session(self, guild: discord.Guild, session: Dict, play_next):
+        guild_id = guild.id
+        if guild.voice_client:
+            return
+
+        voice_channel = guild.get_channel(session['voice_channel_id'])
+        if not isinstance(voice_channel, discord.VoiceChannel):
+            await self.db.delete_guild_session(guild_id)
+            return
+
+        text_channel = guild.get_channel(session['text_channel_id']) if session['text_channel_id'] else None
+
+        tracks = []
+        if session['current_track']:
+            tracks.append(PendingTrack(session['current_track'], start_offset=session['position'] or 0.0))
+        tracks.extend(PendingTrack(data) for data in session['queue'] if data.get('url'))
+        if not tracks:
+            await self.db.delete_guild_session(guild_id)
+            return
+
+        await voice_channel.connect()
+
+        async def enqueue_and_play():
+            queue = self.state.get_queue(guild_id)
+            queue.extend(tracks)
+            if text_channel:
+                self.state.set_text_channel_id(guild_id, text_channel.id)
+            await play_next(ChannelInteraction(guild, text_channel), text_channel)
+
+        await self.state.actors.run(guild_id, enqueue_and_play)
+        logger.debug(construct_log(f"Restored {len(tracks)} track(s) in guild {guild_id}"))
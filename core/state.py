@@ -1,49 +1,112 @@
+import itertools
+import sys
+import time
 from collections import defaultdict
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
 import discord
 
+from .actor import GuildActorRegistry
+from .playback import TrackHandoffTracker
+from .scheduler import PlayerUpdateScheduler
+from .timers import DeadlineScheduler
+
+STATE_EVICT_AFTER_SECONDS = 600
+IDLE_DISCONNECT_SECONDS = 180
+
+class TrackQueue(list):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+
+    def _touch(self):
+        self.version += 1
+
+    def append(self, item):
+        super().append(item)
+        self._touch()
+
+    def extend(self, items):
+        super().extend(items)
+        self._touch()
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self._touch()
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self._touch()
+        return item
+
+    def remove(self, item):
+        super().remove(item)
+        self._touch()
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._touch()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._touch()
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
 class GuildState:
     def __init__(self, guild_id: int):
         self.guild_id = guild_id
-        self.queue: list[discord.FFmpegPCMAudio] = []
+        self.queue: TrackQueue = TrackQueue()
         self.current_menu: Optional[discord.ui.View] = None
-        self.playback_start_time: Optional[float] = None
-        self.pause_start_time: Optional[float] = None
-        self.total_paused_time: float = 0.0
         self.player_message: Optional[discord.Message] = None
         self.player_interaction: Optional[discord.Interaction] = None
         self.idle_start_time: Optional[float] = None
         self.all_users_disconnected_time: Optional[float] = None
+        self.text_channel_id: Optional[int] = None
+        self.evictable_since: Optional[float] = None
+        self.render_cache: Dict[str, tuple] = {}
+
+    def approx_size(self) -> int:
+        size = sys.getsizeof(self) + sys.getsizeof(self.__dict__) + sys.getsizeof(self.queue)
+        for song in self.queue:
+            size += sys.getsizeof(song)
+            data = getattr(song, 'data', None)
+            if data:
+                size += sys.getsizeof(data)
+                size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in data.items())
+        return size
 
 class MusicState:
     def __init__(self):
         self._states: Dict[int, GuildState] = {}
+        self.actors = GuildActorRegistry()
+        self.player_updates = PlayerUpdateScheduler()
+        self.deadlines = DeadlineScheduler()
+        self.handoffs = TrackHandoffTracker()
+        self._player_guilds: set[int] = set()
+        self._voice_members: Dict[int, int] = {}
+        self.known_guilds: set[int] = set()
+        # Render-cache identity for audio sources; unlike id(), a token is never handed out twice.
+        self._track_tokens = itertools.count(1)
+    
+    def next_track_token(self) -> int:
+        return next(self._track_tokens)
     
     def get_guild_state(self, guild_id: int) -> GuildState:
         if guild_id not in self._states:
             self._states[guild_id] = GuildState(guild_id)
         return self._states[guild_id]
     
-    def get_queue(self, guild_id: int) -> list:
-        return self.get_guild_state(guild_id).queue
-    
-    def get_playback_start_time(self, guild_id: int) -> Optional[float]:
-        return self.get_guild_state(guild_id).playback_start_time
+    def guild_ids(self) -> List[int]:
+        return list(self._states.keys())
     
-    def set_playback_start_time(self, guild_id: int, time: Optional[float]):
-        self.get_guild_state(guild_id).playback_start_time = time
-    
-    def get_pause_start_time(self, guild_id: int) -> Optional[float]:
-        return self.get_guild_state(guild_id).pause_start_time
-    
-    def set_pause_start_time(self, guild_id: int, time: Optional[float]):
-        self.get_guild_state(guild_id).pause_start_time = time
-    
-    def get_total_paused_time(self, guild_id: int) -> float:
-        return self.get_guild_state(guild_id).total_paused_time
-    
-    def set_total_paused_time(self, guild_id: int, time: float):
-        self.get_guild_state(guild_id).total_paused_time = time
+    def get_queue(self, guild_id: int) -> TrackQueue:
+        return self.get_guild_state(guild_id).queue
     
     def get_player_message(self, guild_id: int) -> Optional[discord.Message]:
         return self.get_guild_state(guild_id).player_message
@@ -53,6 +116,23 @@ class MusicState:
         state.player_message = message
         if interaction:
             state.player_interaction = interaction
+        if message:
+            self._player_guilds.add(guild_id)
+        else:
+            self._player_guilds.discard(guild_id)
+    
+    def player_guild_ids(self) -> List[int]:
+        return list(self._player_guilds)
+    
+    def get_player_content_sent(self, guild_id: int) -> Optional[tuple]:
+        return self.get_guild_state(guild_id).render_cache.get('sent')
+    
+    def set_player_content_sent(self, guild_id: int, content: tuple):
+        self.get_guild_state(guild_id).render_cache['sent'] = content
+    
+    def mark_player_dirty(self, guild_id: int):
+        if guild_id in self._player_guilds:
+            self.player_updates.mark_dirty(guild_id)
     
     def get_player_interaction(self, guild_id: int) -> Optional[discord.Interaction]:
         return self.get_guild_state(guild_id).player_interaction
@@ -61,31 +141,92 @@ class MusicState:
         return self.get_guild_state(guild_id).idle_start_time
     
     def set_idle_start_time(self, guild_id: int, time: Optional[float]):
-        self.get_guild_state(guild_id).idle_start_time = time
+        state = self.get_guild_state(guild_id)
+        state.idle_start_time = time
+        if time is None:
+            self.deadlines.cancel((guild_id, 'idle'))
+            return
+        deadline = time + IDLE_DISCONNECT_SECONDS
+        if state.all_users_disconnected_time:
+            deadline = min(deadline, state.all_users_disconnected_time + IDLE_DISCONNECT_SECONDS)
+        self.deadlines.arm((guild_id, 'idle'), deadline)
     
     def clear_idle_start_time(self, guild_id: int):
-        self.get_guild_state(guild_id).idle_start_time = None
+        self.set_idle_start_time(guild_id, None)
     
     def get_all_users_disconnected_time(self, guild_id: int) -> Optional[float]:
         return self.get_guild_state(guild_id).all_users_disconnected_time
     
     def set_all_users_disconnected_time(self, guild_id: int, time: Optional[float]):
         self.get_guild_state(guild_id).all_users_disconnected_time = time
+        if time is None:
+            self.deadlines.cancel((guild_id, 'empty'))
+        else:
+            self.deadlines.arm((guild_id, 'empty'), time + IDLE_DISCONNECT_SECONDS)
     
     def clear_all_users_disconnected_time(self, guild_id: int):
-        self.get_guild_state(guild_id).all_users_disconnected_time = None
+        self.set_all_users_disconnected_time(guild_id, None)
+    
+    def get_voice_members(self, channel_id: int) -> int:
+        return self._voice_members.get(channel_id, 0)
+    
+    def adjust_voice_members(self, channel_id: int, delta: int) -> int:
+        count = max(0, self._voice_members.get(channel_id, 0) + delta)
+        if count:
+            self._voice_members[channel_id] = count
+        else:
+            self._voice_members.pop(channel_id, None)
+        return count
+    
+    def reset_voice_members(self, counts: Dict[int, int]):
+        self._voice_members = {channel_id: count for channel_id, count in counts.items() if count > 0}
     
     def clear_player_message(self, guild_id: int):
         state = self.get_guild_state(guild_id)
         state.player_message = None
         state.player_interaction = None
+        state.render_cache.pop('sent', None)
+        self._player_guilds.discard(guild_id)
+        self.player_updates.forget(guild_id)
+    
+    def get_text_channel_id(self, guild_id: int) -> Optional[int]:
+        return self.get_guild_state(guild_id).text_channel_id
+    
+    def set_text_channel_id(self, guild_id: int, channel_id: Optional[int]):
+        self.get_guild_state(guild_id).text_channel_id = channel_id
     
     def clear_queue(self, guild_id: int):
-        self.get_guild_state(guild_id).queue = []
+        self.get_guild_state(guild_id).queue.clear()
     
     def remove_guild_state(self, guild_id: int):
         if guild_id in self._states:
             del self._states[guild_id]
+        self._player_guilds.discard(guild_id)
+        self.player_updates.forget(guild_id)
+    
+    def evict_idle_states(self, is_connected: Callable[[int], bool], max_idle: float = STATE_EVICT_AFTER_SECONDS) -> List[int]:
+        current_time = time.time()
+        evicted = []
+        for guild_id, state in list(self._states.items()):
+            if is_connected(guild_id) or len(state.queue) > 0 or state.player_message is not None:
+                state.evictable_since = None
+                continue
+            if state.evictable_since is None:
+                state.evictable_since = current_time
+            elif current_time - state.evictable_since >= max_idle:
+                del self._states[guild_id]
+                evicted.append(guild_id)
+        return evicted
+    
+    def stats(self) -> Dict:
+        sizes = {guild_id: state.approx_size() for guild_id, state in self._states.items()}
+        largest = sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:5]
+        return {
+            'live_states': len(sizes),
+            'approx_bytes': sum(sizes.values()),
+            'queued_tracks': sum(len(state.queue) for state in self._states.values()),
+            'largest': largest
+        }
 
 global_state = MusicState()
 
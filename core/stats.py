@@ -0,0 +1,54 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', '60'))
+STATS_CACHE_SIZE = 1024
+# listening_hours is bucketed in UTC; /stats shows busiest times in this offset (hours).
+STATS_UTC_OFFSET = int(os.getenv('STATS_UTC_OFFSET', '7'))
+
+WEEKDAYS = ['Chủ nhật', 'Thứ hai', 'Thứ ba', 'Thứ tư', 'Thứ năm', 'Thứ sáu', 'Thứ bảy']
+
+class TTLCache:
+    """Small in-memory cache whose entries expire after a fixed number of seconds."""
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL, maxsize: int = STATS_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+def format_listening_time(seconds: int) -> str:
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours} giờ {remainder // 60} phút"
+
+def busiest_slots(hours: List[Dict], offset: int = STATS_UTC_OFFSET, limit: int = 3) -> List[Tuple[int, int, int]]:
+    """Shift UTC (dow, hour) buckets into local time and return the busiest as (dow, hour, plays)."""
+    slots = []
+    for row in hours:
+        local = row['dow'] * 24 + row['hour'] + offset
+        dow, hour = divmod(local % (7 * 24), 24)
+        slots.append((dow, hour, row['plays']))
+    slots.sort(key=lambda slot: slot[2], reverse=True)
+    return slots[:limit]
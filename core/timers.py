@@ -0,0 +1,75 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+from .utils import construct_log
+
+logger = logging.getLogger(__name__)
+
+class DeadlineScheduler:
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._entries: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        # The event loop only keeps weak references to tasks, so running handlers are held here.
+        self._tasks: Set[asyncio.Task] = set()
+
+    def arm(self, key: Hashable, deadline: float):
+        seq = next(self._seq)
+        self._entries[key] = seq
+        heapq.heappush(self._heap, (deadline, seq, key))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+        if self._wakeup and self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def is_armed(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if self._entries.get(entry[2]) == entry[1]]
+        heapq.heapify(self._heap)
+
+    def _discard_cancelled(self):
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def pop_expired(self, now: float) -> List[Hashable]:
+        expired = []
+        self._discard_cancelled()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            del self._entries[key]
+            expired.append(key)
+            self._discard_cancelled()
+        return expired
+
+    async def run(self, on_expire: Callable[[Hashable], Awaitable[None]]):
+        self._wakeup = asyncio.Event()
+        while True:
+            self._discard_cancelled()
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            for key in self.pop_expired(time.time()):
+                task = asyncio.create_task(on_expire(key))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                task.add_done_callback(lambda t, key=key: _log_failure(t, key))
+
+def _log_failure(task: asyncio.Task, key: Hashable):
+    if not task.cancelled() and task.exception():
+        logger.error(construct_log(f"Deadline handler for {key} failed: {task.exception()}"))
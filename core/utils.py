@@ -1,13 +1,49 @@
+import os
+import json
+import hashlib
 import time
+import resource
 from datetime import datetime
 from urllib.parse import urlparse
 from typing import Optional, Dict, List, Callable
 
 import discord
 
+QUEUE_PAGE_SIZE = 10
+QUEUE_TITLE_LIMIT = 90
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    return (guild_id >> 22) % shard_count
+
+def owns_guild(bot, guild_id: int) -> bool:
+    shard_ids = getattr(bot, 'shard_ids', None)
+    if not bot.shard_count or shard_ids is None:
+        return True
+    return shard_for_guild(guild_id, bot.shard_count) in shard_ids
+
+def is_primary_process(bot) -> bool:
+    shard_ids = getattr(bot, 'shard_ids', None)
+    return shard_ids is None or 0 in shard_ids
+
+def command_tree_fingerprint(tree) -> str:
+    payload = []
+    for command in sorted(tree.get_commands(), key=lambda cmd: cmd.name):
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            payload.append(command.to_dict())
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
 def construct_log(log):
     return f"{datetime.now()} | {log}"
 
+def get_rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
 def validate_url(url, n=1):
     parsed = urlparse(url)
     if parsed.scheme in ("http", "https"):
@@ -37,6 +73,20 @@ def create_progress_bar(current: int, total: int, length: int = 20) -> str:
     bar = '▰' * filled + '▱' * (length - filled)
     return bar
 
+def get_playback_position(voice_client: Optional[discord.VoiceClient], source=None) -> float:
+    if source is None:
+        source = voice_client.source if voice_client else None
+    return getattr(source, 'position', 0.0)
+
+def player_render_key(state, guild_id: int, voice_client: Optional[discord.VoiceClient], source=None, length: int = 20) -> tuple:
+    if source is None:
+        source = voice_client.source if voice_client else None
+    paused = bool(voice_client and voice_client.is_paused())
+    total_seconds = parse_duration(source.data.get('duration', '00:00')) if hasattr(source, 'data') else 0
+    elapsed = get_playback_position(voice_client, source)
+    cell = min(length, int((elapsed / total_seconds) * length)) if total_seconds else 0
+    return (state.get_queue(guild_id).version, getattr(source, 'render_token', None), paused, cell)
+
 async def join_voice_channel(interaction: discord.Interaction) -> bool:
     if not interaction.user.voice:
         if interaction.response.is_done():
@@ -59,7 +109,7 @@ async def join_voice_channel(interaction: discord.Interaction) -> bool:
         await interaction.user.voice.channel.connect()
     return True
 
-async def resolve_link(link: str, loop, state, voice_id: int, n: int = 1):
+async def resolve_link(link: str, loop, n: int = 1):
     from .audio import YoutubeDLAudioSource
     
     validated_link = validate_url(link, n)
@@ -68,83 +118,91 @@ async def resolve_link(link: str, loop, state, voice_id: int, n: int = 1):
         if not song.data.get('url'):
             song.data['url'] = link
             song.url = link
-    queue = state.get_queue(voice_id)
-    queue.extend(songs)
     return songs
 
+def render_queue_preview(state, guild_id: int, limit: int = 5) -> str:
+    guild_state = state.get_guild_state(guild_id)
+    queue = guild_state.queue
+    cached = guild_state.render_cache.get('queue_preview')
+    if cached and cached[0] == queue.version:
+        return cached[1]
+
+    if queue:
+        queue_text = "\n".join([f"{i+1}. {song.data.get('title', 'Unknown')}" for i, song in enumerate(queue[:limit])])
+        if len(queue) > limit:
+            queue_text += f"\n... và {len(queue) - limit} bài hát khác"
+        text = f"📋\tTiếp theo\n{queue_text}"
+    else:
+        text = "📋\tTiếp theo\nKhông có bài hát nào trong hàng chờ"
+    guild_state.render_cache['queue_preview'] = (queue.version, text)
+    return text
+
+def queue_page_count(queue_length: int) -> int:
+    upcoming = max(0, queue_length - 1)
+    return max(1, (upcoming + QUEUE_PAGE_SIZE - 1) // QUEUE_PAGE_SIZE)
+
+def render_queue_page(state, guild_id: int, page: int) -> str:
+    guild_state = state.get_guild_state(guild_id)
+    queue = guild_state.queue
+    key = (queue.version, page)
+    cached = guild_state.render_cache.get('queue_page')
+    if cached and cached[0] == key:
+        return cached[1]
+
+    offset = page * QUEUE_PAGE_SIZE
+    songs = queue[1 + offset:1 + offset + QUEUE_PAGE_SIZE]
+    text = "\n".join([f"{offset + i + 1}. {song.data['title'][:QUEUE_TITLE_LIMIT]}" for i, song in enumerate(songs)])
+    guild_state.render_cache['queue_page'] = (key, text)
+    return text
+
 def construct_player_embed(
     song: Optional[object],
     voice_client: Optional[discord.VoiceClient],
     state,
-    guild_id: int,
-    playback_start_time,
-    total_paused_time,
-    pause_start_time
+    guild_id: int
 ) -> discord.Embed:
-    embed = discord.Embed(title="🎵 Player", color=discord.Color.blue())
-    
     if song:
-        metadata = song.data
+        source = song
     elif voice_client and (voice_client.is_playing() or voice_client.is_paused()):
-        current_source = voice_client.source
-        if not hasattr(current_source, 'data'):
-            embed.description = "Không thể lấy thông tin bài hát"
-            return embed
-        metadata = current_source.data
+        source = voice_client.source
+        if not hasattr(source, 'data'):
+            return discord.Embed(title="🎵 Player", color=discord.Color.blue(), description="Không thể lấy thông tin bài hát")
     else:
-        embed.description = "Không có bài hát nào đang phát"
-        return embed
+        return discord.Embed(title="🎵 Player", color=discord.Color.blue(), description="Không có bài hát nào đang phát")
 
+    guild_state = state.get_guild_state(guild_id)
+    key = player_render_key(state, guild_id, voice_client, source)
+    cached = guild_state.render_cache.get('player')
+    if cached and cached[0] == key:
+        return cached[1]
+
+    metadata = source.data
     title = metadata.get('title', 'Unknown')
     duration_str = metadata.get('duration', '00:00')
     total_seconds = parse_duration(duration_str)
-    
-    playback_start = playback_start_time.get_playback_start_time(guild_id)
-    if playback_start:
-        base_elapsed = time.time() - playback_start
-        total_paused = total_paused_time.get_total_paused_time(guild_id)
-        
-        if voice_client and voice_client.is_paused():
-            pause_start = pause_start_time.get_pause_start_time(guild_id)
-            if pause_start:
-                current_pause_duration = time.time() - pause_start
-                total_paused += current_pause_duration
-        
-        elapsed = int(base_elapsed - total_paused)
-    else:
-        elapsed = 0
-
-    if elapsed > total_seconds:
-        elapsed = total_seconds
+    elapsed = min(int(get_playback_position(voice_client, source)), total_seconds)
 
-    elapsed_str = format_duration(elapsed) if elapsed >= 0 else "00:00"
+    elapsed_str = format_duration(elapsed)
     progress_bar = create_progress_bar(elapsed, total_seconds)
     
     status_emoji = "⏸️" if (voice_client and voice_client.is_paused()) else "▶️"
     
     description_parts = [
         f"{status_emoji}\t{title}",
-        f"{elapsed_str}\t{progress_bar}\t{duration_str}"
+        f"{elapsed_str}\t{progress_bar}\t{duration_str}",
+        render_queue_preview(state, guild_id)
     ]
 
-    queue = state.get_queue(guild_id)
-    if queue:
-        next_songs = queue[:5]
-        queue_text = "\n".join([f"{i+1}. {song.data.get('title', 'Unknown')}" for i, song in enumerate(next_songs)])
-        if len(queue) > 5:
-            queue_text += f"\n... và {len(queue) - 5} bài hát khác"
-        description_parts.append(f"📋\tTiếp theo\n{queue_text}")
-    else:
-        description_parts.append("📋\tTiếp theo\nKhông có bài hát nào trong hàng chờ")
-
+    embed = discord.Embed(title="🎵 Player", color=discord.Color.blue())
     embed.description = "\n\n".join(description_parts)
-
+    guild_state.render_cache['player'] = (key, embed)
     return embed
 
 def construct_queue_menu_embed(
     state,
     voice_client: Optional[discord.VoiceClient],
-    guild_id: int
+    guild_id: int,
+    page: int = 0
 ) -> discord.Embed:
     embed = discord.Embed(title="📃   Danh sách chờ   📃")
 
@@ -157,7 +215,10 @@ def construct_queue_menu_embed(
         embed.add_field(name="Next up", value=queue[0].data['title'], inline=False)
 
     if len(queue) > 1:
-        embed.add_field(name="Queue", value="\n".join([f"{i+1}. {song.data['title']}" for i, song in enumerate(queue[1:])]), inline=False)
+        total_pages = queue_page_count(len(queue))
+        page = max(0, min(page, total_pages - 1))
+        embed.add_field(name="Queue", value=render_queue_page(state, guild_id, page), inline=False)
+        embed.set_footer(text=f"Trang {page + 1}/{total_pages} • {len(queue)} bài trong hàng chờ")
 
     return embed
 
@@ -1,8 +1,7 @@
-import time
 import discord
 from typing import Optional, Dict
 
-from .utils import construct_queue_menu_embed, construct_media_buttons_embed, parse_duration, format_duration, create_progress_bar
+from .utils import construct_queue_menu_embed, construct_media_buttons_embed, construct_player_embed, queue_page_count
 
 class MediaControlView(discord.ui.View):
     def __init__(self, callbacks: dict[str, callable], interaction):
@@ -28,50 +27,110 @@ class MediaControlView(discord.ui.View):
         await message.edit(view=None)
 
 class PlayerView(discord.ui.View):
-    def __init__(self, bot_instance, interaction):
+    def __init__(self, bot_instance, paused: bool = False):
         super().__init__(timeout=None)
         self.bot_instance = bot_instance
-        self.interaction = interaction
+        self.pause_resume_button.emoji = '▶️' if paused else '⏸️'
 
-    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏮️', row=0)
+    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏮️', row=0, custom_id='player:previous')
     async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
 
-    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏸️', row=0)
+    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏸️', row=0, custom_id='player:pause_resume')
     async def pause_resume_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        # Acknowledge first: the actor may be busy with a track handoff for longer than the 3s interaction window.
+        await interaction.response.defer()
         guild = interaction.guild
-        voice_client = guild.voice_client if guild else None
+        if not guild:
+            return
+        
         state = self.bot_instance.state
-        guild_id = guild.id if guild else None
+        guild_id = guild.id
         
-        if voice_client and voice_client.is_playing():
-            voice_client.pause()
-            state.set_pause_start_time(guild_id, time.time())
-            button.emoji = '▶️'
-        elif voice_client and voice_client.is_paused():
-            voice_client.resume()
-            pause_start = state.get_pause_start_time(guild_id)
-            if pause_start:
-                paused_duration = time.time() - pause_start
-                total_paused = state.get_total_paused_time(guild_id)
-                state.set_total_paused_time(guild_id, total_paused + paused_duration)
-                state.set_pause_start_time(guild_id, None)
-            button.emoji = '⏸️'
-        await interaction.response.edit_message(view=self)
-
-    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏭️', row=0)
+        async def toggle():
+            voice_client = guild.voice_client
+            if voice_client and voice_client.is_playing():
+                voice_client.pause()
+            elif voice_client and voice_client.is_paused():
+                voice_client.resume()
+            state.mark_player_dirty(guild_id)
+            return bool(voice_client and voice_client.is_paused())
+        
+        paused = await state.actors.run(guild_id, toggle)
+        await interaction.edit_original_response(view=self.bot_instance.player_view(paused))
+
+    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏭️', row=0, custom_id='player:skip')
     async def skip_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
         await self.bot_instance._skip_logic(interaction)
 
-    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏹️', row=0)
+    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⏹️', row=0, custom_id='player:stop')
     async def stop_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         guild = interaction.guild
-        voice_client = guild.voice_client if guild else None
-        if voice_client and (voice_client.is_playing() or voice_client.is_paused()):
-            voice_client.stop()
+        
+        async def stop():
+            voice_client = guild.voice_client
+            if voice_client and (voice_client.is_playing() or voice_client.is_paused()):
+                voice_client.stop()
+        
+        await interaction.response.defer()
+        if guild:
+            await self.bot_instance.state.actors.run(guild.id, stop)
+
+class QueueJumpModal(discord.ui.Modal, title='Nhảy tới trang'):
+    page = discord.ui.TextInput(label='Số trang', max_length=6)
+
+    def __init__(self, queue_view: 'QueueView'):
+        super().__init__()
+        self.queue_view = queue_view
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            page = int(self.page.value) - 1
+        except ValueError:
+            await interaction.response.send_message(embed=discord.Embed(description="Số trang không hợp lệ"), ephemeral=True)
+            return
+        await self.queue_view.show_page(interaction, page)
+
+class QueueView(MediaControlView):
+    def __init__(self, callbacks: dict[str, callable], interaction, state, guild_id: int, page: int = 0):
+        super().__init__(callbacks, interaction)
+        self.state = state
+        self.guild_id = guild_id
+        self.page = page
+        self._refresh_buttons()
+
+    def _refresh_buttons(self):
+        total_pages = queue_page_count(len(self.state.get_queue(self.guild_id)))
+        self.page = max(0, min(self.page, total_pages - 1))
+        self.page_label.label = f"{self.page + 1}/{total_pages}"
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= total_pages - 1
+        self.jump_page.disabled = total_pages == 1
+
+    async def show_page(self, interaction: discord.Interaction, page: int):
+        self.page = page
+        self._refresh_buttons()
+        voice_client = interaction.guild.voice_client if interaction.guild else None
+        embed = construct_queue_menu_embed(self.state, voice_client, self.guild_id, self.page)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='⬅️', row=1)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(style=discord.ButtonStyle.grey, label='1/1', disabled=True, row=1)
+    async def page_label(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
 
+    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='➡️', row=1)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
+
+    @discord.ui.button(style=discord.ButtonStyle.grey, emoji='🔢', row=1)
+    async def jump_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(QueueJumpModal(self))
+
 def construct_queue_menu(
     state,
     voice_client: Optional[discord.VoiceClient],
@@ -79,26 +138,15 @@ def construct_queue_menu(
     pause_callback,
     resume_callback,
     skip_callback,
-    interaction: discord.Interaction
+    interaction: discord.Interaction,
+    page: int = 0
 ):
-    embed = discord.Embed(title="📃   Danh sách chờ   📃")
-    
-    if voice_client and voice_client.is_playing():
-        current_source = voice_client.source
-        embed.add_field(name="Now playing", value=current_source.data['title'], inline=False)
-
-    queue = state.get_queue(guild_id)
-    if len(queue) > 0:
-        embed.add_field(name="Next up", value=queue[0].data['title'], inline=False)
-
-    if len(queue) > 1:
-        embed.add_field(name="Queue", value="\n".join([f"{i+1}. {song.data['title']}" for i, song in enumerate(queue[1:])]), inline=False)
-
-    return MediaControlView({
+    embed = construct_queue_menu_embed(state, voice_client, guild_id, page)
+    return QueueView({
         'Pause': pause_callback,
         'Resume': resume_callback,
         'Skip': skip_callback
-    }, interaction), embed
+    }, interaction, state, guild_id, page), embed
 
 def construct_media_buttons(metadata: Dict, pause_callback, resume_callback, skip_callback, interaction: discord.Interaction):
     embed = construct_media_buttons_embed(metadata)
@@ -111,75 +159,9 @@ def construct_media_buttons(metadata: Dict, pause_callback, resume_callback, ski
 async def construct_player_embed_for_interaction(
     interaction: discord.Interaction,
     song: Optional[object],
-    state,
-    playback_start_time,
-    total_paused_time,
-    pause_start_time
+    state
 ) -> discord.Embed:
-    embed = discord.Embed(title="🎵 Player", color=discord.Color.blue())
     guild = interaction.guild
     if not guild:
-        embed.description = "Không có bài hát nào đang phát"
-        return embed
-    
-    voice_client = guild.voice_client
-    
-    if song:
-        metadata = song.data
-    elif voice_client and (voice_client.is_playing() or voice_client.is_paused()):
-        current_source = voice_client.source
-        if not hasattr(current_source, 'data'):
-            embed.description = "Không thể lấy thông tin bài hát"
-            return embed
-        metadata = current_source.data
-    else:
-        embed.description = "Không có bài hát nào đang phát"
-        return embed
-
-    title = metadata.get('title', 'Unknown')
-    duration_str = metadata.get('duration', '00:00')
-    total_seconds = parse_duration(duration_str)
-    
-    guild_id = guild.id
-    playback_start = playback_start_time.get_playback_start_time(guild_id)
-    if playback_start:
-        base_elapsed = time.time() - playback_start
-        total_paused = total_paused_time.get_total_paused_time(guild_id)
-        
-        if voice_client and voice_client.is_paused():
-            pause_start = pause_start_time.get_pause_start_time(guild_id)
-            if pause_start:
-                current_pause_duration = time.time() - pause_start
-                total_paused += current_pause_duration
-        
-        elapsed = int(base_elapsed - total_paused)
-    else:
-        elapsed = 0
-
-    if elapsed > total_seconds:
-        elapsed = total_seconds
-
-    elapsed_str = format_duration(elapsed) if elapsed >= 0 else "00:00"
-    progress_bar = create_progress_bar(elapsed, total_seconds)
-    
-    status_emoji = "⏸️" if (voice_client and voice_client.is_paused()) else "▶️"
-    
-    description_parts = [
-        f"{status_emoji}\t{title}",
-        f"{elapsed_str}\t{progress_bar}\t{duration_str}"
-    ]
-
-    queue = state.get_queue(guild_id)
-    if queue:
-        next_songs = queue[:5]
-        queue_text = "\n".join([f"{i+1}. {song.data.get('title', 'Unknown')}" for i, song in enumerate(next_songs)])
-        if len(queue) > 5:
-            queue_text += f"\n... và {len(queue) - 5} bài hát khác"
-        description_parts.append(f"📋\tTiếp theo\n{queue_text}")
-    else:
-        description_parts.append("📋\tTiếp theo\nKhông có bài hát nào trong hàng chờ")
-
-    embed.description = "\n\n".join(description_parts)
-
-    return embed
-
+        return discord.Embed(title="🎵 Player", color=discord.Color.blue(), description="Không có bài hát nào đang phát")
+    return construct_player_embed(song, guild.voice_client, state, guild.id)
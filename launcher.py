@@ -0,0 +1,75 @@
+import asyncio
+import os
+import signal
+import sys
+import time
+import logging
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s launcher: %(message)s')
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY = 5.0
+MAX_RESTART_DELAY = 300.0
+HEALTHY_UPTIME = 60.0
+IDENTIFY_INTERVAL = 5.0
+BOT_DIR = Path(__file__).resolve().parent
+
+def split_shards(shard_count: int, process_count: int) -> list[list[int]]:
+    process_count = max(1, min(process_count, shard_count))
+    return [list(range(shard_count))[index::process_count] for index in range(process_count)]
+
+class ShardProcess:
+    def __init__(self, shard_count: int, shard_ids: list[int]):
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.process: asyncio.subprocess.Process | None = None
+        self.stopping = False
+
+    @property
+    def name(self) -> str:
+        return f"shards {','.join(str(shard_id) for shard_id in self.shard_ids)}"
+
+    async def supervise(self, initial_delay: float = 0.0):
+        # Gateway identifies are limited per bot, so processes come up one after another.
+        await asyncio.sleep(initial_delay)
+        delay = RESTART_DELAY
+        while not self.stopping:
+            env = dict(os.environ, SHARD_COUNT=str(self.shard_count), SHARD_IDS=','.join(str(shard_id) for shard_id in self.shard_ids))
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(sys.executable, str(BOT_DIR / 'run.py'), env=env, cwd=str(BOT_DIR))
+            logger.info(f"Started {self.name} (pid {self.process.pid})")
+            code = await self.process.wait()
+            if self.stopping:
+                break
+
+            if time.monotonic() - started >= HEALTHY_UPTIME:
+                delay = RESTART_DELAY
+            logger.warning(f"{self.name} exited with code {code}, restarting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    def stop(self):
+        self.stopping = True
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+
+async def main():
+    shard_count = int(os.getenv('SHARD_COUNT', '1'))
+    process_count = int(os.getenv('SHARD_PROCESSES', str(os.cpu_count() or 1)))
+    workers = [ShardProcess(shard_count, shard_ids) for shard_ids in split_shards(shard_count, process_count)]
+    logger.info(f"Launching {shard_count} shard(s) across {len(workers)} process(es)")
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: [worker.stop() for worker in workers])
+
+    delays = [sum(len(worker.shard_ids) for worker in workers[:index]) * IDENTIFY_INTERVAL for index in range(len(workers))]
+    await asyncio.gather(*(worker.supervise(delay) for worker, delay in zip(workers, delays)))
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,3 +1,7 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import os
 import logging
@@ -10,7 +14,6 @@ load_dotenv()
 
 discord.utils.setup_logging(level=logging.INFO, root=True)
 
-from core.bot import MusicBot
 from core.database import PlaylistDatabase
 
 VERSION = "2.0.0"
@@ -33,10 +36,8 @@ def compare_versions(version1: str, version2: str) -> int:
             return -1
     return 0
 
-async def check_and_add_version():
-    db = PlaylistDatabase()
+async def check_and_add_version(db: PlaylistDatabase):
     try:
-        await db.connect()
         latest_version = await db.get_latest_version()
         
         if latest_version is None or compare_versions(VERSION, latest_version) > 0:
@@ -49,18 +50,65 @@ async def check_and_add_version():
             logger.info(f"Version {VERSION} is not greater than latest version {latest_version}")
     except Exception as e:
         logger.error(f"Error checking/adding version: {e}")
-    finally:
-        await db.close()
 
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix='!', intents=intents)
+def gateway_options(profile: str) -> dict:
+    if profile != 'lean':
+        return {'intents': discord.Intents.all()}
+    
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.voice_states = True
+    intents.guild_messages = True
+    intents.message_content = True
+    return {
+        'intents': intents,
+        'member_cache_flags': discord.MemberCacheFlags.from_intents(intents),
+        'chunk_guilds_at_startup': False,
+        'max_messages': None
+    }
+
+def create_bot(options: dict) -> commands.Bot:
+    shard_count = os.getenv('SHARD_COUNT')
+    if not shard_count:
+        return commands.Bot(command_prefix='!', **options)
+    
+    shard_ids = os.getenv('SHARD_IDS')
+    return commands.AutoShardedBot(
+        command_prefix='!',
+        shard_count=int(shard_count),
+        shard_ids=[int(shard_id) for shard_id in shard_ids.split(',')] if shard_ids else None,
+        **options
+    )
+
+GATEWAY_PROFILE = os.getenv('GATEWAY_PROFILE', 'full')
+bot = create_bot(gateway_options(GATEWAY_PROFILE))
 bot.app_version = VERSION
 bot.change_note = CHANGE_NOTE
+bot.started_at = STARTED_AT
+bot.startup_timings = {'imports': time.perf_counter() - STARTED_AT}
 
-async def init():
-    await bot.add_cog(MusicBot(bot))
+async def main():
+    async with bot:
+        step = time.perf_counter()
+        bot.db = PlaylistDatabase()
+        await bot.db.connect()
+        bot.startup_timings['db_connect'] = time.perf_counter() - step
+        
+        step = time.perf_counter()
+        if bot.db.pool:
+            async with bot.db.singleton('version_check') as acquired:
+                if acquired:
+                    await check_and_add_version(bot.db)
+        bot.startup_timings['version_check'] = time.perf_counter() - step
+        
+        step = time.perf_counter()
+        await bot.load_extension('core.bot')
+        bot.startup_timings['cog_load'] = time.perf_counter() - step
+        
+        try:
+            await bot.start(os.getenv('DISCORD_API_KEY'))
+        finally:
+            await bot.db.close()
 
 if __name__ == '__main__':
-    asyncio.run(check_and_add_version())
-    asyncio.run(init())
-    bot.run(os.getenv('DISCORD_API_KEY'))
\ No newline at end of file
+    asyncio.run(main())